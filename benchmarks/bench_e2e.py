@@ -0,0 +1,263 @@
+"""Benchmark end-to-end dell'integrazione contro lo stub del bridge.
+
+Uso: python benchmarks/bench_e2e.py [--zones 10,100,1000] [--events N] [--rate R]
+
+Per ogni taglia avvia stub_server.py in un processo separato e un'istanza
+Home Assistant reale (bootstrap da config dict, senza rete esterna) in un
+processo figlio, con l'integrazione collegata tramite config flow. Misura:
+
+- setup della config entry (async_setup_entry + prima lettura delle piattaforme);
+- durata del refresh delle zone, con dati invariati e con dati cambiati;
+- eventi SSE elaborati al secondo durante una tempesta di eventi;
+- latenza evento -> stato dell'entità (dall'invio nello stub allo state_changed);
+- CPU e memoria residente del processo Home Assistant.
+
+Richiede homeassistant e aiohttp installati; funziona offline su Linux.
+"""
+import argparse
+import asyncio
+import json
+import os
+import pathlib
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+STUB = ROOT / "benchmarks" / "stub_server.py"
+DOMAIN = "tado_local"
+# Attesa massima per l'arrivo di tutti gli stati di una tempesta (s)
+STORM_TIMEOUT = 120
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def rss_mb() -> float:
+    """Memoria residente attuale del processo (MB), da /proc."""
+    with open("/proc/self/statm") as statm:
+        pages = int(statm.read().split()[1])
+    return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def start_stub(port: int, args: argparse.Namespace, zones: int) -> subprocess.Popen:
+    command = [
+        sys.executable, str(STUB), "--port", str(port), "--zones", str(zones),
+        "--hot-water", str(args.hot_water), "--latency", str(args.latency),
+        "--jitter", str(args.jitter), "--error-rate", str(args.error_rate),
+    ]
+    return subprocess.Popen(command)
+
+
+async def wait_for_stub(session, base_url: str) -> None:
+    deadline = time.monotonic() + 10
+    while True:
+        try:
+            async with session.get(f"{base_url}/api") as resp:
+                if resp.status == 200:
+                    return
+        except OSError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError("lo stub del bridge non risponde")
+        await asyncio.sleep(0.1)
+
+
+async def bootstrap_hass(config_dir: str):
+    """Istanza Home Assistant reale con la cartella custom_components del repository."""
+    from homeassistant import bootstrap
+    from homeassistant.core import HomeAssistant
+
+    os.symlink(ROOT / "custom_components", pathlib.Path(config_dir) / "custom_components")
+    hass = HomeAssistant(config_dir)
+    await bootstrap.async_from_config_dict({"homeassistant": {}}, hass)
+    await hass.async_start()
+    return hass
+
+
+async def run_single(args: argparse.Namespace) -> Dict[str, Any]:
+    import aiohttp
+
+    from homeassistant.const import EVENT_STATE_CHANGED
+    from homeassistant.helpers import entity_registry as er
+
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    stub = start_stub(port, args, args.single)
+    result: Dict[str, Any] = {"zones": args.single}
+    try:
+        async with aiohttp.ClientSession() as control:
+            await wait_for_stub(control, base_url)
+            with tempfile.TemporaryDirectory() as config_dir:
+                hass = await bootstrap_hass(config_dir)
+                cpu_start = time.process_time()
+                rss_start = rss_mb()
+
+                start = time.monotonic()
+                flow = await hass.config_entries.flow.async_init(
+                    DOMAIN,
+                    context={"source": "user"},
+                    data={"ip_address": "127.0.0.1", "port": port, "update_interval": 3600},
+                )
+                await hass.async_block_till_done()
+                result["setup_s"] = time.monotonic() - start
+                if flow.get("type") != "create_entry":
+                    raise RuntimeError(f"config flow non completato: {flow}")
+                data = hass.data[DOMAIN][flow["result"].entry_id]
+                zone_coordinator = data["zone_coordinator"]
+                metrics = data["client"].metrics
+                result["entities"] = len(hass.states.async_all())
+
+                # Refresh con dati invariati (304/hash) e con dati cambiati
+                unchanged = []
+                for _ in range(args.refreshes):
+                    start = time.monotonic()
+                    await zone_coordinator.async_refresh()
+                    unchanged.append(time.monotonic() - start)
+                changed = []
+                for _ in range(args.refreshes):
+                    async with control.post(f"{base_url}/_stub/mutate"):
+                        pass
+                    start = time.monotonic()
+                    await zone_coordinator.async_refresh()
+                    await hass.async_block_till_done()
+                    changed.append(time.monotonic() - start)
+                result["refresh_unchanged_ms"] = percentile(unchanged, 0.5) * 1000
+                result["refresh_changed_ms"] = percentile(changed, 0.5) * 1000
+
+                # Tempesta di eventi: latenza misurata sui sensori di temperatura corrente
+                registry = er.async_get(hass)
+                sensor_zone = {}
+                for zone_id in zone_coordinator.data:
+                    entity_id = registry.async_get_entity_id("sensor", DOMAIN, f"tado_local_cur_temp_{zone_id}")
+                    if entity_id:
+                        sensor_zone[entity_id] = zone_id
+                observed: Dict[Any, float] = {}
+
+                def on_state_changed(event) -> None:
+                    zone_id = sensor_zone.get(event.data["entity_id"])
+                    new_state = event.data.get("new_state")
+                    if zone_id is None or new_state is None:
+                        return
+                    try:
+                        value = round(float(new_state.state), 2)
+                    except ValueError:
+                        return
+                    observed.setdefault((zone_id, value), time.monotonic())
+
+                # Gli eventi inviati prima dell'apertura dello stream andrebbero persi
+                deadline = time.monotonic() + 10
+                while data["event_stream"].state != "connected" and time.monotonic() < deadline:
+                    await asyncio.sleep(0.05)
+                unsub = hass.bus.async_listen(EVENT_STATE_CHANGED, on_state_changed)
+                events_before = metrics.sse_events
+                # Evento elaborato = applicato oppure superato da uno più recente della stessa zona
+                coalesced_before = metrics.sse_coalesced
+                handled_before = metrics.sse_dispatched + coalesced_before
+                start = time.monotonic()
+                async with control.post(
+                    f"{base_url}/_stub/storm", params={"events": args.events, "rate": args.rate}
+                ):
+                    pass
+                deadline = start + STORM_TIMEOUT
+                while (
+                    metrics.sse_dispatched + metrics.sse_coalesced - handled_before < args.events
+                    and time.monotonic() < deadline
+                ):
+                    await asyncio.sleep(0.01)
+                await hass.async_block_till_done()
+                elapsed = time.monotonic() - start
+                unsub()
+
+                async with control.get(f"{base_url}/_stub/emitted") as resp:
+                    emitted = await resp.json()
+                latencies = [
+                    observed[(zone_id, round(value, 2))] - sent
+                    for zone_id, value, sent in emitted
+                    if (zone_id, round(value, 2)) in observed
+                ]
+                processed = metrics.sse_events - events_before
+                result["events"] = processed
+                result["events_per_s"] = processed / elapsed if elapsed else None
+                result["e2e_p50_ms"] = (percentile(latencies, 0.5) or 0) * 1000
+                result["e2e_p95_ms"] = (percentile(latencies, 0.95) or 0) * 1000
+                result["e2e_max_ms"] = max(latencies, default=0) * 1000
+                result["state_updates"] = len(latencies)
+                result["coalesced"] = metrics.sse_coalesced - coalesced_before
+                result["cpu_s"] = time.process_time() - cpu_start
+                result["rss_mb"] = rss_mb()
+                result["rss_delta_mb"] = result["rss_mb"] - rss_start
+
+                await hass.async_stop()
+    finally:
+        stub.terminate()
+        stub.wait()
+    return result
+
+
+def format_row(row: Dict[str, Any]) -> str:
+    return (
+        f"{row['zones']:>6} {row['entities']:>8} {row['setup_s']:>8.2f} "
+        f"{row['refresh_unchanged_ms']:>9.1f} {row['refresh_changed_ms']:>9.1f} "
+        f"{row['events_per_s']:>9.0f} {row['e2e_p50_ms']:>8.1f} {row['e2e_p95_ms']:>8.1f} "
+        f"{row['e2e_max_ms']:>8.1f} {row['cpu_s']:>7.2f} {row['rss_mb']:>7.1f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--zones", default="10,100,1000", help="taglie da misurare, separate da virgola")
+    parser.add_argument("--hot-water", type=int, default=1)
+    parser.add_argument("--events", type=int, default=5000, help="eventi della tempesta")
+    parser.add_argument("--rate", type=float, default=0, help="eventi/s della tempesta (0 = massimo)")
+    parser.add_argument("--refreshes", type=int, default=5, help="refresh misurati per tipo")
+    parser.add_argument("--latency", type=float, default=0.0, help="latenza iniettata nello stub (s)")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--json", action="store_true", help="stampa i risultati in JSON")
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single is not None:
+        # Processo figlio: una sola taglia, risultato su stdout
+        print(json.dumps(asyncio.run(run_single(args))))
+        return
+
+    rows = []
+    for zones in (int(z) for z in args.zones.split(",")):
+        command = [
+            sys.executable, __file__, "--single", str(zones), "--hot-water", str(args.hot_water),
+            "--events", str(args.events), "--rate", str(args.rate), "--refreshes", str(args.refreshes),
+            "--latency", str(args.latency), "--jitter", str(args.jitter), "--error-rate", str(args.error_rate),
+        ]
+        # Un processo per taglia: CPU e memoria non si sommano tra le misure
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        rows.append(json.loads(output.strip().splitlines()[-1]))
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{args.events} eventi per tempesta, rate {args.rate or 'massimo'}, latenza stub {args.latency}s")
+    print(
+        f"{'zone':>6} {'entità':>8} {'setup s':>8} {'ref= ms':>9} {'ref≠ ms':>9} "
+        f"{'ev/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'cpu s':>7} {'RSS MB':>7}"
+    )
+    for row in rows:
+        print(format_row(row))
+
+
+if __name__ == "__main__":
+    main()
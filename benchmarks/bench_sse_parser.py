@@ -0,0 +1,108 @@
+"""Micro-benchmark del parser SSE (eventi/s e byte allocati per evento).
+
+Uso: python benchmarks/bench_sse_parser.py [--events N] [--chunk BYTES]
+
+Confronta SSEParser con il vecchio parsing riga per riga
+(decode + strip + json.loads) su uno stream sintetico di eventi zona/device.
+"""
+import argparse
+import importlib.util
+import json
+import pathlib
+import time
+import tracemalloc
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+
+
+def load_parser_module():
+    """Carica sse_parser.py senza importare il package (che richiede Home Assistant)."""
+    path = ROOT / "custom_components" / "tado_local" / "sse_parser.py"
+    spec = importlib.util.spec_from_file_location("tado_local_sse_parser", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_stream(count: int) -> bytes:
+    parts = []
+    for i in range(count):
+        if i % 4 == 3:
+            payload = {"type": "device", "device_id": i % 300, "state": {"battery_low": False}}
+        else:
+            payload = {
+                "type": "zone",
+                "zone_id": i % 50,
+                "state": {
+                    "cur_temp_c": 20.5 + (i % 10) / 10,
+                    "hum_perc": 48,
+                    "target_temp_c": 21.0,
+                    "cur_heating": i % 2,
+                    "mode": 1,
+                },
+            }
+        parts.append(f"id: {i}\ndata: {json.dumps(payload)}\n\n".encode())
+        if i % 100 == 99:
+            parts.append(b": heartbeat\n\n")
+    return b"".join(parts)
+
+
+def chunked(stream: bytes, size: int):
+    return [stream[i:i + size] for i in range(0, len(stream), size)]
+
+
+def legacy_parse(chunks):
+    """Parsing originale: righe decodificate una a una, solo `data:` su riga singola."""
+    events = []
+    lines = b"".join(chunks).splitlines(keepends=True)
+    for line in lines:
+        line_str = line.decode("utf-8").strip()
+        if line_str.startswith("data:"):
+            events.append(json.loads(line_str[5:].strip()))
+    return events
+
+
+def parser_parse(module, chunks):
+    parser = module.SSEParser()
+    events = []
+    for chunk in chunks:
+        for event in parser.feed(chunk):
+            events.append(event.json())
+    return events
+
+
+def measure(name, func, count, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        events = func()
+        best = min(best, time.perf_counter() - start)
+    assert len(events) == count, (name, len(events))
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    events = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{name:<10} {count / best:>12,.0f} eventi/s   "
+        f"{(peak - before) / count:>8.0f} byte/evento (picco)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--chunk", type=int, default=4096, help="dimensione dei blocchi letti dal socket")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    module = load_parser_module()
+    chunks = chunked(build_stream(args.events), args.chunk)
+    print(f"{args.events} eventi, blocchi da {args.chunk} byte, JSON: {'orjson' if module.orjson else 'json'}")
+    measure("legacy", lambda: legacy_parse(chunks), args.events, args.repeat)
+    measure("SSEParser", lambda: parser_parse(module, chunks), args.events, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
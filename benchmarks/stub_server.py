@@ -0,0 +1,377 @@
+"""Stub locale dell'API TadoLocal per benchmark e prove senza bridge reale.
+
+Uso: python benchmarks/stub_server.py [--zones N] [--devices M] [--port P] ...
+
+Simula N zone, M dispositivi e le zone acqua calda con gli stessi endpoint del
+bridge (/api, /zones, /zones/{id}, /devices, /hot_water/{id}, /…/set, /events).
+Supporta latenza ed errori iniettati, ETag e Last-Event-ID. Lo stream SSE si
+pilota dagli endpoint di controllo /_stub/*:
+
+    POST /_stub/event       corpo JSON inviato come evento (es. {"type": "zone", ...})
+    POST /_stub/storm       ?events=N&rate=R  tempesta di eventi zona (rate 0 = massimo)
+    POST /_stub/mutate      cambia lo stato di tutte le zone (polling "con modifiche")
+    POST /_stub/disconnect  chiude gli stream SSE aperti
+    GET  /_stub/emitted     [[zone_id, cur_temp_c, istante monotonic di invio], ...]
+    GET  /_stub/stats       contatori delle richieste servite
+
+Richiede solo aiohttp; nessuna dipendenza da Home Assistant.
+"""
+import argparse
+import asyncio
+import collections
+import hashlib
+import json
+import random
+import time
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from aiohttp import web
+
+# Eventi conservati per il replay con Last-Event-ID
+HISTORY_SIZE = 10000
+# Intervallo (s) dei commenti heartbeat sullo stream SSE
+HEARTBEAT_INTERVAL = 15
+
+
+class StubBridge:
+    """Stato simulato del bridge e applicazione aiohttp che lo espone."""
+
+    def __init__(
+        self,
+        zones: int = 10,
+        devices: Optional[int] = None,
+        hot_water: int = 1,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        etag: bool = True,
+        retry: Optional[int] = None,
+        seed: int = 0,
+    ) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.etag = etag
+        self.retry = retry
+        self.random = random.Random(seed)
+        self.zones: Dict[int, Dict[str, Any]] = {}
+        self.devices: Dict[int, Dict[str, Any]] = {}
+        self.hot_water: Dict[int, Dict[str, Any]] = {}
+        self._build(zones, zones * 2 if devices is None else devices, hot_water)
+
+        self.seq = 0
+        self.history: Deque[Tuple[int, bytes]] = collections.deque(maxlen=HISTORY_SIZE)
+        self.emitted: List[Tuple[int, float, float]] = []
+        self.stats: Dict[str, int] = collections.Counter()
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._bodies: Dict[str, bytes] = {}
+        self._storm: Optional[asyncio.Task] = None
+
+    def _build(self, zones: int, devices: int, hot_water: int) -> None:
+        heating = max(zones - hot_water, 0)
+        for zone_id in range(1, zones + 1):
+            if zone_id > heating:
+                self.zones[zone_id] = {
+                    "zone_id": zone_id,
+                    "name": f"Hot Water {zone_id}",
+                    "zone_type": "HOT_WATER",
+                    "state": {"mode": 1},
+                }
+                self.hot_water[zone_id] = {
+                    "zone_id": zone_id,
+                    "state": {
+                        "mode": "auto",
+                        "target_temp_c": 50.0,
+                        "min_temp_c": 30.0,
+                        "max_temp_c": 65.0,
+                        "supports_temperature": True,
+                    },
+                }
+                continue
+            self.zones[zone_id] = {
+                "zone_id": zone_id,
+                "name": f"Zone {zone_id}",
+                "zone_type": "HEATING",
+                "state": {
+                    "cur_temp_c": 20.0,
+                    "hum_perc": 50,
+                    "target_temp_c": 21.0,
+                    "cur_heating": 0,
+                    "mode": 1,
+                },
+            }
+        for device_id in range(1, devices + 1):
+            self.devices[device_id] = {
+                "device_id": device_id,
+                "serial_number": f"VA{device_id:08d}",
+                "device_type": "VA02",
+                "zone_id": (device_id - 1) % max(heating, 1) + 1 if heating else None,
+                "state": {"battery_low": False},
+            }
+
+    def heating_zone_ids(self) -> List[int]:
+        return [zid for zid, zone in self.zones.items() if zone["zone_type"] != "HOT_WATER"]
+
+    # --- Stream SSE -------------------------------------------------------
+
+    def emit(self, payload: Dict[str, Any]) -> int:
+        """Applica un evento allo stato simulato e lo invia agli stream aperti."""
+        kind = payload.get("type")
+        if kind == "zone" and payload.get("zone_id") in self.zones:
+            self.zones[payload["zone_id"]]["state"] = dict(payload.get("state", {}))
+            self._bodies.pop("/zones", None)
+        elif kind == "device" and payload.get("device_id") in self.devices:
+            self.devices[payload["device_id"]]["state"] = dict(payload.get("state", {}))
+            self._bodies.pop("/devices", None)
+
+        self.seq += 1
+        frame = f"id: {self.seq}\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n".encode()
+        self.history.append((self.seq, frame))
+        for queue in self._subscribers:
+            queue.put_nowait((self.seq, frame))
+        self.stats["events"] += 1
+        return self.seq
+
+    def emit_zone_temperature(self, zone_id: int, value: float) -> None:
+        state = {**self.zones[zone_id]["state"], "cur_temp_c": value}
+        self.emit({"type": "zone", "zone_id": zone_id, "state": state})
+        self.emitted.append((zone_id, value, time.monotonic()))
+
+    async def storm(self, events: int, rate: float) -> None:
+        """`events` eventi zona a `rate` eventi/s; ogni evento cambia la temperatura."""
+        zone_ids = self.heating_zone_ids()
+        if not zone_ids:
+            return
+        interval = 1 / rate if rate > 0 else 0
+        start = time.monotonic()
+        for index in range(events):
+            zone_id = zone_ids[index % len(zone_ids)]
+            # Valore diverso per ogni passaggio sulla stessa zona (fino a 2000 giri)
+            value = round(10 + (index // len(zone_ids) % 2000) / 100, 2)
+            self.emit_zone_temperature(zone_id, value)
+            if interval:
+                delay = start + (index + 1) * interval - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif index % 200 == 199:
+                await asyncio.sleep(0)
+
+    def mutate(self) -> None:
+        """Cambia lo stato di tutte le zone senza eventi: solo il polling se ne accorge."""
+        for zone in self.zones.values():
+            state = zone["state"]
+            if "hum_perc" in state:
+                state["hum_perc"] = 30 + (state["hum_perc"] - 29) % 60
+        self._bodies.pop("/zones", None)
+
+    async def handle_events(self, request: web.Request) -> web.StreamResponse:
+        response = web.StreamResponse(
+            headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"}
+        )
+        await response.prepare(request)
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.add(queue)
+        self.stats["streams"] += 1
+        try:
+            if self.retry is not None:
+                await response.write(f"retry: {self.retry}\n\n".encode())
+            sent = 0
+            last_event_id = request.headers.get("Last-Event-ID")
+            if last_event_id and last_event_id.isdigit():
+                replay = [frame for seq, frame in self.history if seq > int(last_event_id)]
+                if replay:
+                    await response.write(b"".join(replay))
+                sent = self.history[-1][0] if self.history else 0
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    await response.write(b": heartbeat\n\n")
+                    continue
+                if item is None:
+                    break
+                # Svuota la coda in un'unica scrittura: le tempeste non fanno una write per evento
+                frames = []
+                while item is not None:
+                    seq, frame = item
+                    if seq > sent:
+                        frames.append(frame)
+                        sent = seq
+                    item = queue.get_nowait() if not queue.empty() else None
+                if frames:
+                    await response.write(b"".join(frames))
+        except ConnectionResetError:
+            pass
+        finally:
+            self._subscribers.discard(queue)
+        return response
+
+    def disconnect(self) -> None:
+        for queue in self._subscribers:
+            queue.put_nowait(None)
+
+    # --- API --------------------------------------------------------------
+
+    def _json(self, request: web.Request, key: str, payload: Any) -> web.Response:
+        """Risposta JSON con ETag e 304 se il client ha già il contenuto."""
+        body = self._bodies.get(key)
+        if body is None:
+            body = json.dumps(payload, separators=(",", ":")).encode()
+            self._bodies[key] = body
+        if not self.etag:
+            return web.Response(body=body, content_type="application/json")
+        tag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+        if request.headers.get("If-None-Match") == tag:
+            self.stats["not_modified"] += 1
+            return web.Response(status=304, headers={"ETag": tag})
+        return web.Response(body=body, content_type="application/json", headers={"ETag": tag})
+
+    async def handle_api(self, request: web.Request) -> web.Response:
+        return web.json_response({"name": "TadoLocal stub", "zones": len(self.zones)})
+
+    async def handle_zones(self, request: web.Request) -> web.Response:
+        return self._json(request, "/zones", {"zones": list(self.zones.values())})
+
+    async def handle_zone(self, request: web.Request) -> web.Response:
+        zone = self.zones.get(int(request.match_info["zone_id"]))
+        if zone is None:
+            raise web.HTTPNotFound()
+        return web.json_response({"zone": zone})
+
+    async def handle_devices(self, request: web.Request) -> web.Response:
+        return self._json(request, "/devices", {"devices": list(self.devices.values())})
+
+    async def handle_hot_water(self, request: web.Request) -> web.Response:
+        zone_id = int(request.match_info["zone_id"])
+        if zone_id not in self.hot_water:
+            raise web.HTTPNotFound()
+        return self._json(request, f"/hot_water/{zone_id}", self.hot_water[zone_id])
+
+    async def handle_set_zone(self, request: web.Request) -> web.Response:
+        zone_id = int(request.match_info["zone_id"])
+        zone = self.zones.get(zone_id)
+        if zone is None:
+            raise web.HTTPNotFound()
+        temperature = float(request.query["temperature"])
+        state = dict(zone["state"])
+        if temperature == 0:
+            state["mode"] = 0
+        elif temperature == -1:
+            state["mode"] = 2
+        else:
+            state.update(mode=1, target_temp_c=temperature)
+        # Come il bridge reale: il cambio viene anche notificato sullo stream
+        self.emit({"type": "zone", "zone_id": zone_id, "state": state})
+        return web.json_response({"success": True})
+
+    async def handle_set_hot_water(self, request: web.Request) -> web.Response:
+        zone_id = int(request.match_info["zone_id"])
+        if zone_id not in self.hot_water:
+            raise web.HTTPNotFound()
+        state = self.hot_water[zone_id]["state"]
+        state["mode"] = request.query.get("mode", state["mode"])
+        if "temperature" in request.query:
+            state["target_temp_c"] = float(request.query["temperature"])
+        self._bodies.pop(f"/hot_water/{zone_id}", None)
+        return web.json_response({"success": True})
+
+    # --- Controllo ----------------------------------------------------------
+
+    async def handle_control_event(self, request: web.Request) -> web.Response:
+        return web.json_response({"id": self.emit(await request.json())})
+
+    async def handle_control_storm(self, request: web.Request) -> web.Response:
+        events = int(request.query.get("events", 1000))
+        rate = float(request.query.get("rate", 0))
+        if self._storm is not None and not self._storm.done():
+            self._storm.cancel()
+        self._storm = asyncio.get_running_loop().create_task(self.storm(events, rate))
+        return web.json_response({"events": events, "rate": rate})
+
+    async def handle_control_mutate(self, request: web.Request) -> web.Response:
+        self.mutate()
+        return web.json_response({"success": True})
+
+    async def handle_control_disconnect(self, request: web.Request) -> web.Response:
+        self.disconnect()
+        return web.json_response({"success": True})
+
+    async def handle_control_emitted(self, request: web.Request) -> web.Response:
+        emitted, self.emitted = self.emitted, []
+        return web.json_response(emitted)
+
+    async def handle_control_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(dict(self.stats))
+
+    @web.middleware
+    async def inject_faults(self, request: web.Request, handler):
+        """Latenza ed errori iniettati (esclusi /events e gli endpoint di controllo)."""
+        path = request.path
+        if path.startswith("/_stub") or path == "/events":
+            return await handler(request)
+        self.stats[request.method + " " + path] += 1
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.stats["errors"] += 1
+            return web.Response(status=500, text="errore iniettato")
+        return await handler(request)
+
+    def make_app(self) -> web.Application:
+        app = web.Application(middlewares=[self.inject_faults])
+        app.add_routes(
+            [
+                web.get("/api", self.handle_api),
+                web.get("/zones", self.handle_zones),
+                web.get("/zones/{zone_id}", self.handle_zone),
+                web.post("/zones/{zone_id}/set", self.handle_set_zone),
+                web.get("/devices", self.handle_devices),
+                web.get("/hot_water/{zone_id}", self.handle_hot_water),
+                web.post("/hot_water/{zone_id}/set", self.handle_set_hot_water),
+                web.get("/events", self.handle_events),
+                web.post("/_stub/event", self.handle_control_event),
+                web.post("/_stub/storm", self.handle_control_storm),
+                web.post("/_stub/mutate", self.handle_control_mutate),
+                web.post("/_stub/disconnect", self.handle_control_disconnect),
+                web.get("/_stub/emitted", self.handle_control_emitted),
+                web.get("/_stub/stats", self.handle_control_stats),
+            ]
+        )
+        return app
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4407)
+    parser.add_argument("--zones", type=int, default=10, help="zone totali (acqua calda inclusa)")
+    parser.add_argument("--devices", type=int, default=None, help="dispositivi (default: 2 per zona)")
+    parser.add_argument("--hot-water", type=int, default=1, help="zone acqua calda")
+    parser.add_argument("--latency", type=float, default=0.0, help="latenza fissa per richiesta (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="latenza casuale aggiuntiva massima (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="frazione di richieste che rispondono 500")
+    parser.add_argument("--no-etag", action="store_true", help="disattiva ETag/304 (il client usa l'hash del corpo)")
+    parser.add_argument("--retry", type=int, default=None, help="campo retry: inviato all'apertura dello stream (ms)")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser
+
+
+def main() -> None:
+    args = build_arg_parser().parse_args()
+    bridge = StubBridge(
+        zones=args.zones,
+        devices=args.devices,
+        hot_water=args.hot_water,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        etag=not args.no_etag,
+        retry=args.retry,
+        seed=args.seed,
+    )
+    web.run_app(bridge.make_app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,102 +1,145 @@
 import asyncio
 import logging
-import json
-import aiohttp
-import async_timeout
-from datetime import timedelta
+from typing import List, NamedTuple
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
-from homeassistant.helpers.update_coordinator import (
-    DataUpdateCoordinator,
-    UpdateFailed,
+import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.aiohttp_client import async_create_clientsession
+from homeassistant.helpers.typing import ConfigType
+
+from .api import TadoLocalClient, build_endpoint_urls
+from .commands import CommandScheduler
+from .history import TadoLocalZoneHistory
+from .coordinator import (
+    TadoLocalDeviceCoordinator,
+    TadoLocalHotWaterCoordinator,
+    TadoLocalZoneCoordinator,
+)
+from .services import async_setup_services
+from .snapshot import TadoLocalSnapshot, async_remove_snapshot
+from .sse import TadoLocalEventStream
+from .const import (
+    DOMAIN,
+    CONF_IP_ADDRESS,
+    CONF_PORT,
+    CONF_UPDATE_INTERVAL,
+    CONF_PUSH_ONLY,
+    CONF_FALLBACK_HOSTS,
+    CONF_COMMAND_CONCURRENCY,
+    CONF_SSE_MAX_SILENCE,
+    DEFAULT_PUSH_ONLY,
+    DEFAULT_FALLBACK_HOSTS,
+    DEFAULT_COMMAND_CONCURRENCY,
+    DEFAULT_SSE_MAX_SILENCE,
+    PLATFORMS,
 )
-
-from .const import DOMAIN, CONF_IP_ADDRESS, CONF_PORT, CONF_UPDATE_INTERVAL, PLATFORMS
 
 _LOGGER = logging.getLogger(__name__)
 
-async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
-    """Configura l'integrazione da una config entry."""
-    
-    # Legge dai dati iniziali o dalle opzioni modificate
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Registra i servizi dell'integrazione."""
+    async_setup_services(hass)
+    return True
+
+class EntryConfig(NamedTuple):
+    """Impostazioni di una config entry, dalle opzioni o dai dati iniziali."""
+
+    base_urls: List[str]  # principale e di riserva
+    interval: int
+    push_only: bool
+    concurrency: int
+    max_silence: int
+
+
+def _entry_config(entry: ConfigEntry) -> EntryConfig:
+    """Legge le impostazioni dell'entry: le opzioni prevalgono sui dati iniziali."""
     config = entry.options if entry.options else entry.data
-    
+
     ip = config.get(CONF_IP_ADDRESS, entry.data.get(CONF_IP_ADDRESS))
     port = config.get(CONF_PORT, entry.data.get(CONF_PORT))
-    interval = config.get(CONF_UPDATE_INTERVAL, entry.data.get(CONF_UPDATE_INTERVAL))
+    fallback_hosts = config.get(CONF_FALLBACK_HOSTS, DEFAULT_FALLBACK_HOSTS)
+    return EntryConfig(
+        base_urls=build_endpoint_urls(ip, port, fallback_hosts),
+        interval=config.get(CONF_UPDATE_INTERVAL, entry.data.get(CONF_UPDATE_INTERVAL)),
+        push_only=config.get(CONF_PUSH_ONLY, DEFAULT_PUSH_ONLY),
+        concurrency=config.get(CONF_COMMAND_CONCURRENCY, DEFAULT_COMMAND_CONCURRENCY),
+        max_silence=config.get(CONF_SSE_MAX_SILENCE, DEFAULT_SSE_MAX_SILENCE),
+    )
+
+async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    """Configura l'integrazione da una config entry."""
     
-    base_url = f"http://{ip}:{port}"
-
-    async def async_get_data():
-        """Polling di backup: scarica dati completi (Zone + Device)."""
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with async_timeout.timeout(15):
-                    # Zone
-                    async with session.get(f"{base_url}/zones") as resp_zones:
-                        if resp_zones.status != 200:
-                            raise UpdateFailed(f"Errore API Zones: {resp_zones.status}")
-                        zones_json = await resp_zones.json()
-
-                    # Device
-                    async with session.get(f"{base_url}/devices") as resp_devices:
-                        if resp_devices.status != 200:
-                            raise UpdateFailed(f"Errore API Devices: {resp_devices.status}")
-                        devices_json = await resp_devices.json()
-
-                    zones_list = zones_json.get("zones", zones_json) if isinstance(zones_json, dict) else zones_json
-                    devices_list = devices_json.get("devices", devices_json) if isinstance(devices_json, dict) else devices_json
-
-                    # Enrich hot water zones with detailed state/capabilities
-                    hw_zones = [z for z in zones_list if z.get("zone_type") == "HOT_WATER"]
-                    for zone in hw_zones:
-                        zid = zone.get("zone_id") or zone.get("id")
-                        if zid is None:
-                            continue
-                        try:
-                            async with session.get(f"{base_url}/hot_water/{zid}") as resp_hw:
-                                if resp_hw.status == 200:
-                                    hw_json = await resp_hw.json()
-                                    # Merge state details back into zone.state.hot_water
-                                    if "state" in hw_json:
-                                        zone.setdefault("state", {})
-                                        zone["state"]["hot_water"] = hw_json["state"]
-                                else:
-                                    _LOGGER.debug("Hot water API %s returned %s", zid, resp_hw.status)
-                        except Exception as err:
-                            _LOGGER.debug("Errore caricamento hot water %s: %s", zid, err)
-
-                    return {
-                        "zones": zones_list,
-                        "devices": devices_list
-                    }
-
-            except Exception as err:
-                raise UpdateFailed(f"Errore di connessione: {err}")
-
-    coordinator = DataUpdateCoordinator(
-        hass,
-        _LOGGER,
-        name="tado_local_data",
-        update_method=async_get_data,
-        update_interval=timedelta(seconds=interval),
+    config = _entry_config(entry)
+    base_urls = config.base_urls
+
+    # Sessione dedicata sul connettore condiviso di HA: si chiude allo scaricamento dell'entry
+    session = async_create_clientsession(hass, auto_cleanup=False)
+    client = TadoLocalClient(base_urls, session, owns_session=True)
+    zone_coordinator = TadoLocalZoneCoordinator(hass, client, config.interval, config.push_only)
+    device_coordinator = TadoLocalDeviceCoordinator(hass, client)
+    hot_water_coordinator = TadoLocalHotWaterCoordinator(hass, client, zone_coordinator)
+
+    zone_history = TadoLocalZoneHistory(hass, zone_coordinator)
+
+    snapshot = TadoLocalSnapshot(
+        hass, entry.entry_id, zone_coordinator, device_coordinator, hot_water_coordinator, zone_history
     )
+    if await snapshot.async_restore():
+        # Entità create subito dallo snapshot: il bridge viene letto in background
+        entry.async_create_background_task(
+            hass,
+            _async_live_refresh(zone_coordinator, device_coordinator, hot_water_coordinator),
+            "tado_local_live_refresh",
+        )
+    else:
+        try:
+            await asyncio.gather(
+                zone_coordinator.async_config_entry_first_refresh(),
+                device_coordinator.async_config_entry_first_refresh(),
+            )
+            # I dettagli acqua calda dipendono dalle zone appena scaricate
+            await hot_water_coordinator.async_config_entry_first_refresh()
+        except Exception:
+            await client.async_close()
+            raise
 
-    await coordinator.async_config_entry_first_refresh()
+    entry.async_on_unload(hot_water_coordinator.async_track_zones())
+    # Prima delle piattaforme: lo storico registra il campione prima che i sensori lo leggano
+    entry.async_on_unload(zone_history.async_track())
+    entry.async_on_unload(snapshot.async_track())
+    snapshot.async_schedule_save()
+
+    event_stream = TadoLocalEventStream(hass, zone_coordinator, device_coordinator, client, config.max_silence)
+    commands = CommandScheduler(hass, config.concurrency)
 
     hass.data.setdefault(DOMAIN, {})
     hass.data[DOMAIN][entry.entry_id] = {
-        "coordinator": coordinator,
-        "base_url": base_url,
+        "zone_coordinator": zone_coordinator,
+        "device_coordinator": device_coordinator,
+        "hot_water_coordinator": hot_water_coordinator,
+        "base_urls": base_urls,
+        "client": client,
+        "event_stream": event_stream,
+        "commands": commands,
+        "zone_history": zone_history,
     }
 
     # Avviamo il background task per gli eventi SSE (Push)
-    entry.async_create_background_task(
+    sse_task = entry.async_create_background_task(
         hass, 
-        sse_listener(hass, coordinator, base_url), 
+        event_stream.run(), 
         "tado_local_sse_listener"
     )
+    # Salute degli endpoint: sceglie il più veloce e abilita il failover
+    health_task = entry.async_create_background_task(
+        hass, client.async_run_health_checks(), "tado_local_health_checks"
+    )
+    # Fermati allo scaricamento prima di chiudere la sessione che usano
+    hass.data[DOMAIN][entry.entry_id]["background_tasks"] = [sse_task, health_task]
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
     
@@ -105,67 +148,52 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     
     return True
 
-async def update_listener(hass: HomeAssistant, entry: ConfigEntry):
-    """Ricarica l'integrazione quando le opzioni cambiano."""
-    await hass.config_entries.async_reload(entry.entry_id)
+async def _async_live_refresh(
+    zone_coordinator: TadoLocalZoneCoordinator,
+    device_coordinator: TadoLocalDeviceCoordinator,
+    hot_water_coordinator: TadoLocalHotWaterCoordinator,
+) -> None:
+    """Primo refresh dal bridge dopo un avvio dallo snapshot."""
+    await asyncio.gather(zone_coordinator.async_refresh(), device_coordinator.async_refresh())
+    await hot_water_coordinator.async_refresh()
 
-async def sse_listener(hass: HomeAssistant, coordinator: DataUpdateCoordinator, base_url: str):
-    """Ascolta lo stream SSE."""
-    url = f"{base_url}/events"
-    while True:
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, timeout=None) as response:
-                    async for line in response.content:
-                        line_str = line.decode("utf-8").strip()
-                        if line_str.startswith("data:"):
-                            json_str = line_str[5:].strip()
-                            try:
-                                event_data = json.loads(json_str)
-                                handle_event(coordinator, event_data)
-                            except json.JSONDecodeError:
-                                pass
-        except Exception:
-            await asyncio.sleep(10)
-
-def handle_event(coordinator: DataUpdateCoordinator, event: dict):
-    """Aggiorna i dati locali."""
-    event_type = event.get("type")
-    current_data = coordinator.data
-    zones_list = current_data.get("zones", [])
-    devices_list = current_data.get("devices", [])
-    updated = False
-
-    if event_type == "zone":
-        zone_id = event.get("zone_id")
-        new_state = event.get("state")
-        if zone_id and new_state:
-            for zone in zones_list:
-                zid = zone.get("zone_id") or zone.get("id")
-                if zid == zone_id:
-                    zone["state"] = new_state
-                    updated = True
-                    break
-
-    elif event_type == "device":
-        device_id = event.get("device_id")
-        new_state = event.get("state")
-        if device_id and new_state:
-            for device in devices_list:
-                did = device.get("device_id") or device.get("id")
-                if did == device_id:
-                    device["state"] = new_state
-                    updated = True
-                    break
-
-    if updated:
-        coordinator.async_set_updated_data({
-            "zones": zones_list,
-            "devices": devices_list
-        })
+async def update_listener(hass: HomeAssistant, entry: ConfigEntry):
+    """Applica le opzioni modificate senza ricaricare l'integrazione."""
+    data = hass.data.get(DOMAIN, {}).get(entry.entry_id)
+    if data is None:
+        await hass.config_entries.async_reload(entry.entry_id)
+        return
+
+    config = _entry_config(entry)
+    base_urls = config.base_urls
+    zone_coordinator = data["zone_coordinator"]
+    zone_coordinator.async_set_poll_options(config.interval, config.push_only)
+    data["commands"].set_concurrency(config.concurrency)
+    data["event_stream"].set_max_silence(config.max_silence)
+
+    if base_urls != data["base_urls"]:
+        # Nuovi indirizzi: stesso client (sessione e metriche), stream ricollegato e dati riallineati
+        _LOGGER.debug("Bridge Tado Local spostato su %s", base_urls)
+        data["base_urls"] = base_urls
+        data["client"].set_endpoints(base_urls)
+        data["event_stream"].reconnect()
+        await zone_coordinator.async_request_refresh()
+        await data["device_coordinator"].async_request_refresh()
+        await data["hot_water_coordinator"].async_request_refresh()
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id)
+        data = hass.data[DOMAIN].pop(entry.entry_id)
+        # Prima lo stream SSE e i controlli di salute, poi la sessione HTTP
+        tasks = data["background_tasks"]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        data["commands"].async_shutdown()
+        await data["client"].async_close()
     return unload_ok
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Elimina lo snapshot salvato della config entry."""
+    await async_remove_snapshot(hass, entry.entry_id)
@@ -0,0 +1,405 @@
+"""Client HTTP per le API TadoLocal."""
+import asyncio
+import hashlib
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, TypeVar, Union
+
+import aiohttp
+
+from homeassistant.util.json import json_loads
+
+from .metrics import TadoLocalMetrics
+
+_LOGGER = logging.getLogger(__name__)
+
+# Richieste simultanee massime verso il bridge (lo stream SSE è escluso)
+MAX_CONCURRENT_REQUESTS = 4
+# Timeout per singola richiesta, in secondi
+REQUEST_TIMEOUT = 10
+# Controllo di salute degli endpoint (solo con più endpoint configurati)
+HEALTH_CHECK_INTERVAL = 5
+HEALTH_CHECK_TIMEOUT = 2
+# Peso dell'ultima misura nella latenza media di un endpoint
+LATENCY_SMOOTHING = 0.3
+# Dopo un 404/405 su /zones/{id} si riprova il percorso mirato dopo questo intervallo (s)
+SINGLE_ZONE_REPROBE_INTERVAL = 900
+
+_T = TypeVar("_T")
+
+
+class TadoLocalApiError(Exception):
+    """Errore di comunicazione con l'API TadoLocal."""
+
+
+class _EndpointUnavailable(TadoLocalApiError):
+    """Errore lato server (5xx): si prova l'endpoint successivo."""
+
+
+# Errori per cui una richiesta passa all'endpoint successivo
+_FAILOVER_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, _EndpointUnavailable)
+
+
+def is_transient_error(err: BaseException) -> bool:
+    """Errore di rete, timeout o 5xx: la stessa richiesta può riuscire riprovando."""
+    return isinstance(err, _FAILOVER_ERRORS)
+
+
+def build_endpoint_urls(ip: str, port: int, fallback_hosts: str = "") -> List[str]:
+    """URL del bridge principale seguiti da quelli di riserva ("host[:porta], ...")."""
+    urls = [f"http://{ip}:{port}"]
+    for host in (h.strip() for h in (fallback_hosts or "").split(",")):
+        if not host:
+            continue
+        name, sep, host_port = host.rpartition(":")
+        if not sep:
+            name, host_port = host, str(port)
+        if not name or not host_port.isdigit():
+            raise ValueError(f"Endpoint non valido: {host}")
+        url = f"http://{name}:{int(host_port)}"
+        if url not in urls:
+            urls.append(url)
+    return urls
+
+
+class Endpoint:
+    """Un processo TadoLocal raggiungibile e il suo stato di salute."""
+
+    __slots__ = ("url", "healthy", "latency", "failures")
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        self.healthy = True
+        # Latenza media (s) del controllo di salute, None finché non misurata
+        self.latency: Optional[float] = None
+        self.failures = 0
+
+    def record_success(self, latency: Optional[float] = None) -> None:
+        self.healthy = True
+        self.failures = 0
+        if latency is not None:
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency += (latency - self.latency) * LATENCY_SMOOTHING
+
+    def record_failure(self) -> None:
+        self.healthy = False
+        self.failures += 1
+
+
+class PollResult(NamedTuple):
+    """Risposta di un polling condizionale: `changed` è False se identica alla precedente."""
+
+    data: Any
+    changed: bool
+
+
+class _CachedBody:
+    """Validatori e contenuto decodificato dell'ultima risposta di un endpoint."""
+
+    __slots__ = ("etag", "last_modified", "digest", "data")
+
+    def __init__(self, etag: Optional[str], last_modified: Optional[str], digest: bytes, data: Any) -> None:
+        self.etag = etag
+        self.last_modified = last_modified
+        self.digest = digest
+        self.data = data
+
+
+def _unwrap(payload: Any, key: str) -> Any:
+    """Il bridge può restituire la lista nuda o avvolta in {key: [...]}."""
+    return payload.get(key, payload) if isinstance(payload, dict) else payload
+
+
+def _raise_for_status(resp: aiohttp.ClientResponse, path: str) -> None:
+    if resp.status >= 500:
+        raise _EndpointUnavailable(f"Errore API {path}: {resp.status}")
+    if resp.status != 200:
+        raise TadoLocalApiError(f"Errore API {path}: {resp.status}")
+
+
+class TadoLocalClient:
+    """Client condiviso (uno per config entry) sulla sessione HTTP di Home Assistant.
+
+    Accetta più endpoint (es. container principale e di riserva): ogni richiesta va
+    al più veloce tra quelli sani e, se fallisce per rete o errore 5xx, passa subito
+    al successivo.
+    """
+
+    def __init__(
+        self,
+        base_url: Union[str, Sequence[str]],
+        session: aiohttp.ClientSession,
+        metrics: Optional[TadoLocalMetrics] = None,
+        owns_session: bool = False,
+    ) -> None:
+        self.endpoints: List[Endpoint] = []
+        self.metrics = metrics if metrics is not None else TadoLocalMetrics()
+        # Sessione creata per questa config entry (da chiudere allo scaricamento)
+        # o condivisa di Home Assistant (mai chiusa dal client)
+        self._owns_session = owns_session
+        self.session = session
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        self._timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+        # None finché non si sa se il bridge espone GET /zones/{id}
+        self._single_zone_supported: Optional[bool] = None
+        # Istante (monotonic) della prossima verifica di /zones/{id} dopo un rifiuto
+        self._single_zone_reprobe_at: Optional[float] = None
+        self._cache: Dict[str, _CachedBody] = {}
+        self.set_endpoints([base_url] if isinstance(base_url, str) else base_url)
+
+    @property
+    def base_url(self) -> str:
+        """URL dell'endpoint preferito in questo momento."""
+        return self._ordered_endpoints()[0].url
+
+    def set_endpoints(self, urls: Sequence[str]) -> None:
+        """Punta il client a nuovi indirizzi del bridge, mantenendo sessione e metriche."""
+        previous = {endpoint.url: endpoint for endpoint in self.endpoints}
+        self.endpoints = [previous.get(url) or Endpoint(url) for url in urls]
+        self._single_zone_supported = None
+        self._single_zone_reprobe_at = None
+        self._cache = {}
+
+    def _ordered_endpoints(self) -> List[Endpoint]:
+        """Endpoint sani dal più veloce, poi quelli in errore; a parità, l'ordine configurato."""
+        ranked = sorted(
+            enumerate(self.endpoints),
+            key=lambda item: (
+                not item[1].healthy,
+                item[1].latency if item[1].latency is not None else float("inf"),
+                item[0],
+            ),
+        )
+        return [endpoint for _, endpoint in ranked]
+
+    def is_healthy(self, url: str) -> bool:
+        return any(endpoint.url == url and endpoint.healthy for endpoint in self.endpoints)
+
+    def mark_failed(self, url: str) -> None:
+        """Segnala un endpoint non raggiungibile (es. stream SSE caduto)."""
+        for endpoint in self.endpoints:
+            if endpoint.url == url:
+                endpoint.record_failure()
+
+    async def _request(self, path: str, send: Callable[[str], Awaitable[_T]]) -> _T:
+        """Esegue `send(url)` sull'endpoint migliore, passando al successivo se non risponde."""
+        last_error: Optional[BaseException] = None
+        for endpoint in self._ordered_endpoints():
+            try:
+                result = await send(endpoint.url)
+            except _FAILOVER_ERRORS as err:
+                endpoint.record_failure()
+                last_error = err
+                if len(self.endpoints) > 1:
+                    _LOGGER.debug("Endpoint %s non disponibile per %s: %s", endpoint.url, path, err)
+                continue
+            endpoint.record_success()
+            return result
+        if isinstance(last_error, TadoLocalApiError):
+            raise last_error
+        raise TadoLocalApiError(f"Errore API {path}: {last_error}") from last_error
+
+    async def async_check_endpoints(self) -> None:
+        """Controllo di salute di tutti gli endpoint (latenza di /api)."""
+
+        async def check(endpoint: Endpoint) -> None:
+            start = time.monotonic()
+            try:
+                async with self.session.get(
+                    f"{endpoint.url}/api", timeout=aiohttp.ClientTimeout(total=HEALTH_CHECK_TIMEOUT)
+                ) as resp:
+                    healthy = resp.status == 200
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                healthy = False
+            if healthy:
+                endpoint.record_success(time.monotonic() - start)
+            else:
+                endpoint.record_failure()
+
+        await asyncio.gather(*(check(endpoint) for endpoint in self.endpoints))
+
+    async def async_run_health_checks(self) -> None:
+        """Ciclo dei controlli di salute (attivo solo con più endpoint configurati)."""
+        while True:
+            if len(self.endpoints) > 1:
+                await self.async_check_endpoints()
+            await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+
+    async def async_close(self) -> None:
+        """Chiude la sessione HTTP (solo se dedicata a questo client)."""
+        if self._owns_session and not self.session.closed:
+            await self.session.close()
+
+    @contextmanager
+    def _measure(self, path: str) -> Iterator[None]:
+        """Registra la latenza (ed eventuale errore) di una richiesta."""
+        start = time.monotonic()
+        success = False
+        try:
+            yield
+            success = True
+        finally:
+            self.metrics.observe_request(path, time.monotonic() - start, success)
+
+    async def _get_json(self, path: str) -> Any:
+        async def send(url: str) -> Any:
+            async with self.session.get(f"{url}{path}", timeout=self._timeout) as resp:
+                _raise_for_status(resp, path)
+                return await resp.json()
+
+        async with self._semaphore:
+            with self._measure(path):
+                return await self._request(path, send)
+
+    async def _poll_json(self, path: str) -> PollResult:
+        """GET condizionale: ETag/Last-Modified se il bridge li offre, altrimenti hash del corpo.
+
+        Se il contenuto non è cambiato restituisce i dati già decodificati, senza decodificare.
+        """
+        cached = self._cache.get(path)
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        async def send(url: str) -> Optional[tuple]:
+            async with self.session.get(f"{url}{path}", headers=headers, timeout=self._timeout) as resp:
+                if resp.status == 304 and cached is not None:
+                    return None
+                _raise_for_status(resp, path)
+                return await resp.read(), resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+
+        async with self._semaphore:
+            with self._measure(path):
+                response = await self._request(path, send)
+        if response is None:
+            return PollResult(cached.data, False)
+        body, etag, last_modified = response
+
+        digest = hashlib.blake2b(body, digest_size=16).digest()
+        if cached is not None and cached.digest == digest:
+            cached.etag, cached.last_modified = etag, last_modified
+            return PollResult(cached.data, False)
+
+        data = json_loads(body)
+        self._cache[path] = _CachedBody(etag, last_modified, digest, data)
+        return PollResult(data, True)
+
+    async def _post(self, path: str, params: Dict[str, str]) -> None:
+        async def send(url: str) -> None:
+            async with self.session.post(f"{url}{path}", params=params, timeout=self._timeout) as resp:
+                if resp.status >= 500:
+                    raise _EndpointUnavailable(f"Errore API {path}: {await resp.text()}")
+                if resp.status != 200:
+                    raise TadoLocalApiError(f"Errore API {path}: {await resp.text()}")
+
+        async with self._semaphore:
+            with self._measure(path):
+                await self._request(path, send)
+
+    async def async_check(self) -> None:
+        """Verifica che il bridge risponda (endpoint leggero /api)."""
+        async def send(url: str) -> None:
+            async with self.session.get(f"{url}/api", timeout=self._timeout) as resp:
+                _raise_for_status(resp, "/api")
+
+        await self._request("/api", send)
+
+    async def async_get_zones(self) -> List[Dict[str, Any]]:
+        """Scarica la lista delle zone."""
+        return _unwrap(await self._get_json("/zones"), "zones")
+
+    async def async_poll_zones(self) -> PollResult:
+        """Lista delle zone via GET condizionale."""
+        result = await self._poll_json("/zones")
+        return PollResult(_unwrap(result.data, "zones"), result.changed)
+
+    async def async_get_zone(self, zone_id) -> Optional[Dict[str, Any]]:
+        """Scarica una sola zona.
+
+        Usa /zones/{id} se il bridge lo supporta, altrimenti ripiega su /zones e
+        riprova il percorso mirato ogni `SINGLE_ZONE_REPROBE_INTERVAL` secondi
+        (il bridge può essere aggiornato o sostituito).
+        """
+        if self._single_zone_supported is False and time.monotonic() >= self._single_zone_reprobe_at:
+            self._single_zone_supported = None
+        if self._single_zone_supported is not False:
+            path = f"/zones/{zone_id}"
+
+            async def send(url: str) -> Any:
+                async with self.session.get(f"{url}{path}", timeout=self._timeout) as resp:
+                    if resp.status in (404, 405) and not self._single_zone_supported:
+                        return None
+                    _raise_for_status(resp, path)
+                    return await resp.json()
+
+            async with self._semaphore:
+                with self._measure(path):
+                    zone_json = await self._request(path, send)
+            if zone_json is not None:
+                self._single_zone_supported = True
+                self._single_zone_reprobe_at = None
+                if isinstance(zone_json, dict) and isinstance(zone_json.get("zone"), dict):
+                    return zone_json["zone"]
+                return zone_json
+            if self._single_zone_reprobe_at is None:
+                _LOGGER.warning(
+                    "GET /zones/{id} non supportato dal bridge: i refresh mirati scaricano /zones "
+                    "(nuova verifica ogni %ds)",
+                    SINGLE_ZONE_REPROBE_INTERVAL,
+                )
+            else:
+                _LOGGER.debug("GET /zones/{id} ancora non supportato dal bridge")
+            self._single_zone_supported = False
+            self._single_zone_reprobe_at = time.monotonic() + SINGLE_ZONE_REPROBE_INTERVAL
+
+        for zone in await self.async_get_zones():
+            if (zone.get("zone_id") or zone.get("id")) == zone_id:
+                return zone
+        return None
+
+    async def async_get_devices(self) -> List[Dict[str, Any]]:
+        """Scarica la lista dei dispositivi."""
+        return _unwrap(await self._get_json("/devices"), "devices")
+
+    async def async_poll_devices(self) -> PollResult:
+        """Lista dei dispositivi via GET condizionale."""
+        result = await self._poll_json("/devices")
+        return PollResult(_unwrap(result.data, "devices"), result.changed)
+
+    async def async_get_hot_water(self, zone_id) -> Dict[str, Any]:
+        """Scarica stato e capacità di una zona acqua calda."""
+        return await self._get_json(f"/hot_water/{zone_id}")
+
+    async def async_poll_hot_water(self, zone_id) -> PollResult:
+        """Dettaglio acqua calda via GET condizionale."""
+        return await self._poll_json(f"/hot_water/{zone_id}")
+
+    async def async_set_zone(self, zone_id, temperature) -> None:
+        """Imposta la temperatura di una zona (0 = OFF, -1 = AUTO)."""
+        await self._post(f"/zones/{zone_id}/set", {"temperature": str(temperature)})
+
+    async def async_set_hot_water(self, zone_id, mode: str, temperature: Optional[float] = None) -> None:
+        """Imposta modalità (e opzionalmente temperatura) dell'acqua calda."""
+        params = {"mode": mode}
+        if temperature is not None:
+            params["temperature"] = str(temperature)
+        await self._post(f"/hot_water/{zone_id}/set", params)
+
+    def events(self, last_event_id: Optional[str] = None, base_url: Optional[str] = None) -> Any:
+        """Apre lo stream SSE /events sulla connessione condivisa.
+
+        Con `last_event_id` il bridge può ritrasmettere gli eventi persi; `base_url`
+        sceglie l'endpoint (default: il preferito).
+        """
+        headers = {"Accept": "text/event-stream"}
+        if last_event_id is not None:
+            headers["Last-Event-ID"] = last_event_id
+        return self.session.get(
+            f"{base_url or self.base_url}/events", headers=headers, timeout=aiohttp.ClientTimeout(total=None)
+        )
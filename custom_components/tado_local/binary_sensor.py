@@ -4,104 +4,56 @@ from homeassistant.components.binary_sensor import (
     BinarySensorEntity,
     BinarySensorDeviceClass,
 )
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .const import DOMAIN, MANUFACTURER, format_model
+from .entity import TadoLocalDeviceEntity, TadoLocalZoneEntity, async_setup_record_entities
+from .const import DOMAIN
 
 _LOGGER = logging.getLogger(__name__)
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback) -> None:
     """Configura i sensori binari Tado Local."""
     data = hass.data[DOMAIN][entry.entry_id]
-    coordinator = data["coordinator"]
+    zone_coordinator = data["zone_coordinator"]
+    device_coordinator = data["device_coordinator"]
     
-    entities = []
-    
-    zones = coordinator.data.get("zones", [])
-    for zone in zones:
-        entities.append(TadoZoneHeating(coordinator, zone))
-        
-    devices = coordinator.data.get("devices", [])
-    for device in devices:
-        entities.append(TadoDeviceBattery(coordinator, device))
-
-    async_add_entities(entities)
-
-
-class TadoZoneHeating(CoordinatorEntity, BinarySensorEntity):
+    # Zone e dispositivi aggiunti o rimossi dal bridge vengono seguiti senza ricaricare
+    async_setup_record_entities(
+        hass, entry, zone_coordinator, async_add_entities, "binary_sensor", "zone",
+        lambda zone: [TadoZoneHeating(zone_coordinator, zone)],
+    )
+    async_setup_record_entities(
+        hass, entry, device_coordinator, async_add_entities, "binary_sensor", "device",
+        lambda device: [TadoDeviceBattery(device_coordinator, device)],
+    )
+
+
+class TadoZoneHeating(TadoLocalZoneEntity, BinarySensorEntity):
     _attr_has_entity_name = True
     _attr_icon = "mdi:radiator"
     _attr_translation_key = "heating_active"
 
-    def __init__(self, coordinator, zone_data):
-        super().__init__(coordinator)
-        self._zone_id = zone_data.get("zone_id") or zone_data.get("id")
-        self._zone_name = zone_data.get("name")
+    def __init__(self, coordinator, zone):
+        super().__init__(coordinator, zone)
         self._attr_unique_id = f"tado_local_heating_{self._zone_id}"
 
-    @property
-    def device_info(self):
-        return {
-            "identifiers": {(DOMAIN, "zone", self._zone_id)},
-            "name": self._zone_name,
-            "manufacturer": MANUFACTURER,
-            "model": format_model("zone_control"),
-        }
-
     @property
     def is_on(self):
-        zones = self.coordinator.data.get("zones", [])
-        for zone in zones:
-            zid = zone.get("zone_id") or zone.get("id")
-            if zid == self._zone_id:
-                state = zone.get("state", zone)
-                val = state.get("cur_heating", 0)
-                return val > 0
-        return False
+        zone = self.record
+        return zone is not None and (zone.state.cur_heating or 0) > 0
 
 
-class TadoDeviceBattery(CoordinatorEntity, BinarySensorEntity):
+class TadoDeviceBattery(TadoLocalDeviceEntity, BinarySensorEntity):
     _attr_device_class = BinarySensorDeviceClass.BATTERY
     _attr_has_entity_name = True
     _attr_translation_key = "battery_low"
 
-    def __init__(self, coordinator, device_data):
-        super().__init__(coordinator)
-        self._device_id = device_data.get("device_id") or device_data.get("id")
-        self._serial = device_data.get("serial_number")
-        if not self._serial:
-            self._serial = f"Unknown_{self._device_id}"
-
+    def __init__(self, coordinator, device):
+        super().__init__(coordinator, device)
         self._attr_unique_id = f"tado_local_batt_{self._device_id}"
-        
-        via_device = None
-        zone_id = device_data.get("zone_id")
-        if zone_id:
-            via_device = (DOMAIN, "zone", zone_id)
-
-        raw_model = device_data.get("device_type", "Device")
-
-        self._device_info_data = {
-            "identifiers": {(DOMAIN, "device", self._device_id)},
-            "name": f"Tado {self._serial}",
-            "manufacturer": MANUFACTURER,
-            "model": format_model(raw_model),
-            "via_device": via_device,
-            "serial_number": self._serial
-        }
-
-    @property
-    def device_info(self):
-        return self._device_info_data
 
     @property
     def is_on(self):
-        devices = self.coordinator.data.get("devices", [])
-        for dev in devices:
-            did = dev.get("device_id") or dev.get("id")
-            if did == self._device_id:
-                state = dev.get("state", dev)
-                return state.get("battery_low", False)
-        return False
\ No newline at end of file
+        device = self.record
+        return device is not None and device.battery_low
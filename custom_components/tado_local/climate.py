@@ -1,5 +1,5 @@
 import logging
-import aiohttp
+from functools import partial
 from typing import Any, Dict
 
 from homeassistant.components.climate import ClimateEntity
@@ -13,32 +13,36 @@ from homeassistant.const import (
     PRECISION_TENTHS,
 )
 from homeassistant.core import HomeAssistant
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.config_entries import ConfigEntry
 
-from .const import DOMAIN, MANUFACTURER, format_model
+from .api import TadoLocalApiError
+from .commands import command_priority
+from .entity import TadoLocalZoneEntity, async_setup_record_entities, values_match
+from .const import DOMAIN
+from .models import EMPTY_ZONE_STATE, Zone, ZoneState
 
 _LOGGER = logging.getLogger(__name__)
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback) -> None:
     """Configura le entità Climate."""
     data = hass.data[DOMAIN][entry.entry_id]
-    coordinator = data["coordinator"]
-    base_url = data["base_url"]
-
-    entities = []
-    zones_list = coordinator.data.get("zones", [])
-
-    for zone in zones_list:
-        if zone.get("zone_type") == "HOT_WATER":
-            continue  # handled by water_heater platform
-        entities.append(TadoLocalClimate(coordinator, zone, base_url))
-
-    async_add_entities(entities)
+    coordinator = data["zone_coordinator"]
+    client = data["client"]
+    commands = data["commands"]
+
+    def create_entities(zone):
+        if zone.is_hot_water:
+            return []  # handled by water_heater platform
+        return [TadoLocalClimate(coordinator, zone, client, commands)]
+
+    # Zone aggiunte o rimosse dal bridge vengono seguite senza ricaricare
+    async_setup_record_entities(
+        hass, entry, coordinator, async_add_entities, "climate", "zone", create_entities
+    )
 
 
-class TadoLocalClimate(CoordinatorEntity, ClimateEntity):
+class TadoLocalClimate(TadoLocalZoneEntity, ClimateEntity):
     """Rappresentazione di una Zona Tado Local."""
 
     _attr_has_entity_name = True
@@ -53,44 +57,43 @@ class TadoLocalClimate(CoordinatorEntity, ClimateEntity):
     
     _attr_hvac_modes = [HVACMode.HEAT, HVACMode.OFF, HVACMode.AUTO]
 
-    def __init__(self, coordinator, initial_data, base_url):
-        super().__init__(coordinator)
-        self._zone_id = initial_data.get("zone_id") or initial_data.get("id")
-        self._attr_name = initial_data.get("name", f"Zona {self._zone_id}")
+    def __init__(self, coordinator, zone: Zone, client, commands):
+        super().__init__(coordinator, zone)
+        self._attr_name = zone.name or f"Zona {self._zone_id}"
         self._attr_unique_id = f"tado_local_zone_{self._zone_id}"
-        self._base_url = base_url
-
-    @property
-    def device_info(self):
-        """Device Info per la Zona Logica."""
-        return {
-            "identifiers": {(DOMAIN, "zone", self._zone_id)},
-            "name": self._attr_name,
-            "manufacturer": MANUFACTURER,
-            "model": format_model("zone_control"), # Usa "Zone Control" formattato
-        }
+        self._client = client
+        self._commands = commands
 
     @property
-    def _zone_data(self) -> dict:
-        raw_data = self.coordinator.data
-        zones_list = raw_data.get("zones", [])
-        for zone in zones_list:
-            zid = zone.get("zone_id") or zone.get("id")
-            if zid == self._zone_id:
-                return zone.get("state", zone)
-        return {}
+    def _zone_state(self) -> ZoneState:
+        zone = self.record
+        state = zone.state if zone is not None else EMPTY_ZONE_STATE
+        if self._optimistic:
+            return state.replace(**self._optimistic)
+        return state
+
+    def _optimistic_confirmed(self) -> bool:
+        zone = self.record
+        if zone is None:
+            return False
+        requested = self._optimistic
+        # Conta solo acceso/spento: il bridge può riportare un modo diverso da quello inviato
+        if "mode" in requested and (zone.state.mode == 0) != (requested["mode"] == 0):
+            return False
+        target = requested.get("target_temp_c")
+        return target is None or values_match(zone.state.target_temp_c, target)
 
     @property
     def current_temperature(self):
-        return self._zone_data.get("cur_temp_c")
+        return self._zone_state.cur_temp_c
 
     @property
     def target_temperature(self):
-        return self._zone_data.get("target_temp_c")
+        return self._zone_state.target_temp_c
 
     @property
     def hvac_mode(self) -> HVACMode:
-        mode = self._zone_data.get("mode") 
+        mode = self._zone_state.mode
         if mode == 0:
             return HVACMode.OFF
         return HVACMode.HEAT
@@ -117,15 +120,33 @@ class TadoLocalClimate(CoordinatorEntity, ClimateEntity):
         await self._async_send_zone_update(temp)
 
     async def _async_send_zone_update(self, temperature):
-        url = f"{self._base_url}/zones/{self._zone_id}/set"
-        params = {"temperature": str(temperature)}
-
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(url, params=params) as response:
-                    if response.status != 200:
-                        _LOGGER.error("Errore update Tado: %s", await response.text())
-                    else:
-                        await self.coordinator.async_request_refresh()
-            except Exception as err:
-                _LOGGER.error("Errore connessione update: %s", err)
+        # Bridge in errore: il servizio fallisce subito invece di accodare
+        self._commands.raise_if_open()
+        priority = command_priority(self._context)
+        # Stato ottimistico immediato; al bridge arriva solo l'ultimo valore del gesto
+        if temperature == 0:
+            self._async_set_optimistic({"mode": 0})
+        elif temperature == -1:
+            # AUTO: il target dipende dalla programmazione, si attende il bridge
+            self._async_set_optimistic({})
+        else:
+            self._async_set_optimistic({"target_temp_c": float(temperature), "mode": 1})
+        self._commands.async_submit(
+            ("zone", self._zone_id), partial(self._async_write_zone, temperature, priority)
+        )
+
+    async def _async_write_zone(self, temperature, priority):
+        try:
+            await self._commands.async_run(
+                partial(self._client.async_set_zone, self._zone_id, temperature), priority
+            )
+        except TadoLocalApiError as err:
+            _LOGGER.error("Errore update Tado: %s", err)
+            self._async_rollback_optimistic()
+        except Exception as err:
+            _LOGGER.error("Errore connessione update: %s", err)
+            self._async_rollback_optimistic()
+        else:
+            self._async_optimistic_sent()
+            # Conferma solo se la lettura riporta già i valori inviati, altrimenti attende l'evento SSE
+            await self.coordinator.async_refresh_zone(self._zone_id)
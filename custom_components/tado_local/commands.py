@@ -0,0 +1,211 @@
+"""Scheduler dei comandi verso il bridge: coalescenza, priorità, concorrenza, ritentativi e circuito."""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from homeassistant.core import Context, HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+
+from .api import TadoLocalApiError, is_transient_error
+from .const import DEFAULT_COMMAND_CONCURRENCY
+
+_LOGGER = logging.getLogger(__name__)
+
+# Finestra di assestamento (s): trascinare uno slider produce un solo comando
+COMMAND_SETTLE_DELAY = 0.5
+# Priorità dei comandi (valore minore = servito prima)
+PRIORITY_USER = 0
+PRIORITY_AUTOMATION = 1
+# Tentativi per comando sugli errori transitori (rete, timeout, 5xx) e attesa iniziale (s), raddoppiata a ogni ritentativo
+COMMAND_ATTEMPTS = 3
+RETRY_BACKOFF = 0.5
+# Errori transitori consecutivi che aprono il circuito e durata (s) dell'apertura
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 30
+
+
+class CommandRejectedError(TadoLocalApiError, HomeAssistantError):
+    """Comando rifiutato senza contattare il bridge (circuito aperto)."""
+
+
+def command_priority(context: Optional[Context]) -> int:
+    """Un'azione di un utente (contesto con user_id) precede automazioni e script."""
+    if context is not None and context.user_id:
+        return PRIORITY_USER
+    return PRIORITY_AUTOMATION
+
+
+class CommandScheduler:
+    """Coda unica dei comandi di una config entry.
+
+    Per ogni chiave (es. una zona) invia solo l'ultimo comando richiesto: ogni nuova
+    richiesta riavvia la finestra di assestamento e allo scadere un invio precedente
+    ancora in corso viene annullato perché superato. Le scritture passano da una coda
+    a priorità con al più `concurrency` richieste simultanee, ritentano gli errori
+    transitori e, se il bridge continua a fallire, il circuito si apre: per
+    `BREAKER_COOLDOWN` secondi i comandi vengono rifiutati subito.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        concurrency: int = DEFAULT_COMMAND_CONCURRENCY,
+        delay: float = COMMAND_SETTLE_DELAY,
+    ) -> None:
+        self.hass = hass
+        self.delay = delay
+        self.concurrency = concurrency
+        self._pending: Dict[Any, Callable[[], Awaitable[None]]] = {}
+        self._timers: Dict[Any, asyncio.TimerHandle] = {}
+        self._inflight: Dict[Any, asyncio.Task] = {}
+        # Scritture in corso e in attesa di un posto, ordinate per (priorità, arrivo)
+        self._active = 0
+        self._waiting: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._failures = 0
+        self._open_until = 0.0
+        self.retries = 0
+        self.rejected = 0
+
+    @callback
+    def async_submit(self, key: Any, send: Callable[[], Awaitable[None]]) -> None:
+        """Accoda `send` per `key`, sostituendo l'eventuale comando in attesa."""
+        self._pending[key] = send
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        self._timers[key] = self.hass.loop.call_later(self.delay, self._fire, key)
+
+    @callback
+    def _fire(self, key: Any) -> None:
+        self._timers.pop(key, None)
+        send = self._pending.pop(key, None)
+        if send is None:
+            return
+        inflight = self._inflight.get(key)
+        if inflight is not None and not inflight.done():
+            _LOGGER.debug("Comando Tado Local per %s superato, annullato", key)
+            inflight.cancel()
+        task = self.hass.async_create_task(send())
+        self._inflight[key] = task
+        task.add_done_callback(partial(self._task_done, key))
+
+    @callback
+    def _task_done(self, key: Any, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    @property
+    def circuit_open(self) -> bool:
+        return time.monotonic() < self._open_until
+
+    def raise_if_open(self) -> None:
+        """Fallisce subito, senza accodare, se il bridge è considerato non disponibile."""
+        if self.circuit_open:
+            self.rejected += 1
+            raise CommandRejectedError("Bridge Tado Local non disponibile, comando rifiutato")
+
+    @callback
+    def set_concurrency(self, concurrency: int) -> None:
+        self.concurrency = concurrency
+        self._wake()
+
+    async def async_run(self, send: Callable[[], Awaitable[None]], priority: int = PRIORITY_AUTOMATION) -> None:
+        """Esegue una scrittura sul bridge rispettando coda, limite di concorrenza, ritentativi e circuito."""
+        self.raise_if_open()
+        await self._acquire(priority)
+        try:
+            for attempt in range(COMMAND_ATTEMPTS):
+                # Il circuito può essersi aperto durante l'attesa in coda
+                self.raise_if_open()
+                try:
+                    await send()
+                except Exception as err:
+                    if not is_transient_error(err):
+                        raise
+                    self._record_failure()
+                    if attempt == COMMAND_ATTEMPTS - 1 or self.circuit_open:
+                        raise
+                    self.retries += 1
+                    delay = RETRY_BACKOFF * 2**attempt
+                    _LOGGER.debug("Comando Tado Local fallito (%s), nuovo tentativo tra %.1fs", err, delay)
+                    await asyncio.sleep(delay)
+                else:
+                    self._record_success()
+                    return
+        finally:
+            self._release()
+
+    async def _acquire(self, priority: int) -> None:
+        if self._active < self.concurrency and not self._waiting:
+            self._active += 1
+            return
+        future = self.hass.loop.create_future()
+        heapq.heappush(self._waiting, (priority, next(self._sequence), future))
+        # In coda possono restare solo comandi annullati: il posto può essere già libero
+        self._wake()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Posto assegnato mentre il comando veniva annullato: si libera
+                self._release()
+            raise
+
+    def _release(self) -> None:
+        self._active -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiting and self._active < self.concurrency:
+            _, _, future = heapq.heappop(self._waiting)
+            if future.done():
+                # Comando annullato (superato) mentre era in coda
+                continue
+            self._active += 1
+            future.set_result(None)
+
+    def _record_failure(self) -> None:
+        self._failures += 1
+        if self._failures >= BREAKER_THRESHOLD and not self.circuit_open:
+            # Dopo la pausa il primo comando fa da prova: se fallisce il circuito si riapre
+            self._open_until = time.monotonic() + BREAKER_COOLDOWN
+            _LOGGER.warning(
+                "Bridge Tado Local in errore (%d fallimenti consecutivi): comandi sospesi per %ds",
+                self._failures,
+                BREAKER_COOLDOWN,
+            )
+
+    def _record_success(self) -> None:
+        if self._failures >= BREAKER_THRESHOLD:
+            _LOGGER.info("Bridge Tado Local di nuovo raggiungibile: comandi riattivati")
+        self._failures = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "active": self._active,
+            "queued": sum(1 for _, _, future in self._waiting if not future.done()),
+            "consecutive_failures": self._failures,
+            "circuit_open": self.circuit_open,
+            "retries": self.retries,
+            "rejected": self.rejected,
+        }
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Annulla comandi in attesa e in corso (scaricamento dell'entry)."""
+        for timer in self._timers.values():
+            timer.cancel()
+        for task in self._inflight.values():
+            task.cancel()
+        for _, _, future in self._waiting:
+            future.cancel()
+        self._timers.clear()
+        self._pending.clear()
+        self._inflight.clear()
+        self._waiting.clear()
@@ -1,18 +1,28 @@
 import voluptuous as vol
-import aiohttp
 import async_timeout
 from typing import Any, Dict, Optional
 
 from homeassistant import config_entries
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.data_entry_flow import FlowResult
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+
+from .api import TadoLocalClient, build_endpoint_urls
 
 from .const import (
     DOMAIN,
     CONF_IP_ADDRESS,
     CONF_PORT,
     CONF_UPDATE_INTERVAL,
+    CONF_PUSH_ONLY,
+    CONF_FALLBACK_HOSTS,
+    CONF_COMMAND_CONCURRENCY,
+    CONF_SSE_MAX_SILENCE,
     DEFAULT_UPDATE_INTERVAL,
+    DEFAULT_PUSH_ONLY,
+    DEFAULT_FALLBACK_HOSTS,
+    DEFAULT_COMMAND_CONCURRENCY,
+    DEFAULT_SSE_MAX_SILENCE,
     DEFAULT_PORT,
 )
 
@@ -20,15 +30,12 @@ async def validate_input(hass: HomeAssistant, data: Dict[str, Any]) -> None:
     """Valida l'input utente tentando una connessione."""
     ip = data[CONF_IP_ADDRESS]
     port = data[CONF_PORT]
-    # Usa un endpoint leggero per il test
-    url = f"http://{ip}:{port}/api" 
-    
-    async with aiohttp.ClientSession() as session:
-        async with async_timeout.timeout(5):
-            # Endpoint generico (visto nel PDF pagina 1)
-            async with session.get(url) as response:
-                if response.status != 200:
-                    raise Exception("Status code not 200")
+    # Usa la sessione condivisa di HA: quella dedicata serve solo a entry configurata
+    client = TadoLocalClient(f"http://{ip}:{port}", async_get_clientsession(hass))
+
+    async with async_timeout.timeout(5):
+        # Endpoint generico (visto nel PDF pagina 1)
+        await client.async_check()
 
 class TadoLocalConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Gestisce il flusso di configurazione per Tado Local."""
@@ -85,11 +92,21 @@ class TadoLocalOptionsFlowHandler(config_entries.OptionsFlow):
 
         if user_input is not None:
             try:
-                # Validiamo anche le modifiche
-                await validate_input(self.hass, user_input)
-            except Exception:
-                errors["base"] = "cannot_connect"
+                # Endpoint di riserva: "host[:porta]" separati da virgola
+                build_endpoint_urls(
+                    user_input[CONF_IP_ADDRESS],
+                    user_input[CONF_PORT],
+                    user_input.get(CONF_FALLBACK_HOSTS, DEFAULT_FALLBACK_HOSTS),
+                )
+            except ValueError:
+                errors[CONF_FALLBACK_HOSTS] = "invalid_host"
             else:
+                try:
+                    # Validiamo anche le modifiche (solo l'endpoint principale)
+                    await validate_input(self.hass, user_input)
+                except Exception:
+                    errors["base"] = "cannot_connect"
+            if not errors:
                 # Aggiorna la configurazione esistente
                 return self.async_create_entry(title="", data=user_input)
 
@@ -101,11 +118,25 @@ class TadoLocalOptionsFlowHandler(config_entries.OptionsFlow):
         current_ip = current_options.get(CONF_IP_ADDRESS, current_data.get(CONF_IP_ADDRESS))
         current_port = current_options.get(CONF_PORT, current_data.get(CONF_PORT))
         current_interval = current_options.get(CONF_UPDATE_INTERVAL, current_data.get(CONF_UPDATE_INTERVAL))
+        current_push_only = current_options.get(CONF_PUSH_ONLY, DEFAULT_PUSH_ONLY)
+        current_fallback = current_options.get(CONF_FALLBACK_HOSTS, DEFAULT_FALLBACK_HOSTS)
+        current_concurrency = current_options.get(CONF_COMMAND_CONCURRENCY, DEFAULT_COMMAND_CONCURRENCY)
+        current_max_silence = current_options.get(CONF_SSE_MAX_SILENCE, DEFAULT_SSE_MAX_SILENCE)
 
         options_schema = vol.Schema({
             vol.Required(CONF_IP_ADDRESS, default=current_ip): str,
             vol.Required(CONF_PORT, default=current_port): int,
             vol.Required(CONF_UPDATE_INTERVAL, default=current_interval): int,
+            vol.Required(CONF_PUSH_ONLY, default=current_push_only): bool,
+            vol.Optional(CONF_FALLBACK_HOSTS, default=current_fallback): str,
+            # Comandi simultanei verso il bridge (coda a priorità oltre il limite)
+            vol.Optional(CONF_COMMAND_CONCURRENCY, default=current_concurrency): vol.All(
+                vol.Coerce(int), vol.Range(min=1, max=10)
+            ),
+            # Secondi senza eventi né heartbeat prima di riaprire lo stream (0 = mai)
+            vol.Optional(CONF_SSE_MAX_SILENCE, default=current_max_silence): vol.All(
+                vol.Coerce(int), vol.Range(min=0, max=3600)
+            ),
         })
 
         return self.async_show_form(
@@ -5,9 +5,19 @@ DOMAIN = "tado_local"
 CONF_IP_ADDRESS = "ip_address"
 CONF_PORT = "port"
 CONF_UPDATE_INTERVAL = "update_interval"
+CONF_PUSH_ONLY = "push_only"
+CONF_FALLBACK_HOSTS = "fallback_hosts"
+CONF_COMMAND_CONCURRENCY = "command_concurrency"
+CONF_SSE_MAX_SILENCE = "sse_max_silence"
 
 DEFAULT_UPDATE_INTERVAL = 30
 DEFAULT_PORT = 4407
+DEFAULT_PUSH_ONLY = False
+DEFAULT_FALLBACK_HOSTS = ""
+# Comandi simultanei verso il bridge (le letture hanno il proprio limite nel client)
+DEFAULT_COMMAND_CONCURRENCY = 2
+# Secondi senza dati (eventi o heartbeat) dopo cui lo stream SSE viene riaperto; 0 = mai
+DEFAULT_SSE_MAX_SILENCE = 60
 
 PLATFORMS = ["climate", "sensor", "binary_sensor", "water_heater"]
 
@@ -0,0 +1,428 @@
+"""Coordinator dei dati Tado Local.
+
+Zone, dispositivi e dettagli acqua calda hanno cadenze diverse: ognuno ha il
+proprio coordinator, con intervallo e gestione degli errori indipendenti.
+"""
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+import time
+from datetime import timedelta
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Union
+
+import async_timeout
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.update_coordinator import (
+    DataUpdateCoordinator,
+    UpdateFailed,
+)
+
+from .api import TadoLocalClient
+from .metrics import TadoLocalMetrics
+from .models import Device, HotWater, Zone, parse_devices, parse_zones
+
+_LOGGER = logging.getLogger(__name__)
+
+# Limite complessivo di sicurezza per un refresh (i timeout sono per richiesta)
+REFRESH_TIMEOUT = 30
+# Con lo stream SSE attivo il polling di backup viene diradato di questo fattore
+PUSH_POLL_MULTIPLIER = 10
+# Inventario dispositivi (seriali, modelli, batteria): cambia nell'arco di giorni
+DEVICE_UPDATE_INTERVAL = timedelta(hours=1)
+# Capacità acqua calda (min/max, supporto temperatura): statiche, riscaricate di rado.
+# Lo stato dinamico si riscarica solo quando cambia la zona corrispondente.
+HOT_WATER_CAPABILITY_TTL = timedelta(hours=6)
+
+
+Record = Union[Zone, Device, HotWater]
+
+
+class TadoLocalCoordinator(DataUpdateCoordinator, ABC):
+    """Base comune: record indicizzati per id, listener per id e impronte."""
+
+    def __init__(
+        self, hass: HomeAssistant, client: TadoLocalClient, name: str, update_interval: Optional[timedelta]
+    ) -> None:
+        super().__init__(
+            hass,
+            _LOGGER,
+            name=name,
+            update_interval=update_interval,
+            # Un polling identico al precedente restituisce lo stesso oggetto: nessuna notifica
+            always_update=False,
+        )
+        self.client = client
+        # Durata (s) di ogni chiamata dell'ultimo refresh, per endpoint
+        self.last_timings: Dict[str, float] = {}
+        # Listener per id: un evento SSE sveglia solo le entità interessate
+        self._keyed_listeners: Dict[Any, List[CALLBACK_TYPE]] = {}
+        # Impronte per id: le entità saltano la scrittura se nulla è cambiato
+        self.fingerprints: Dict[Any, tuple] = {}
+        # Listener di qualunque record modificato singolarmente (es. salvataggio snapshot)
+        self._record_listeners: List[CALLBACK_TYPE] = []
+        # True finché i dati vengono dallo snapshot dell'avvio precedente e non dal bridge
+        self.stale = False
+        # Record modificati fuori da un polling completo (eventi SSE, refresh mirati, snapshot):
+        # il polling successivo rilegge i dati anche se il bridge risponde come la volta prima
+        self._diverged = False
+        # Valore di _diverged all'inizio del refresh in corso
+        self._reparse = False
+
+    @property
+    def metrics(self) -> TadoLocalMetrics:
+        """Metriche della config entry (condivise tramite il client)."""
+        return self.client.metrics
+
+    async def _async_update_data(self) -> Dict[Any, Record]:
+        start = time.monotonic()
+        success = False
+        # Gli eventi che arrivano durante il refresh valgono per il polling successivo
+        self._reparse, self._diverged = self._diverged, False
+        try:
+            data = await self._async_fetch_data()
+            success = True
+            self.stale = False
+            return data
+        finally:
+            if not success:
+                self._diverged = self._diverged or self._reparse
+            self.metrics.observe_refresh(self.name, time.monotonic() - start, success)
+
+    @abstractmethod
+    async def _async_fetch_data(self) -> Dict[Any, Record]:
+        """Scarica i dati del coordinator (implementato dalle sottoclassi)."""
+
+    @callback
+    def async_update_listeners(self) -> None:
+        if not self.stale:
+            # Primo dato live dopo lo snapshot: si torna a notificare solo i cambiamenti
+            self.always_update = False
+        self.metrics.observe_notified(len(self._listeners))
+        super().async_update_listeners()
+
+    @callback
+    def async_restore(self, data: Dict[Any, Record]) -> None:
+        """Carica i dati salvati all'avvio precedente, marcati come non aggiornati.
+
+        Il primo refresh riuscito notifica comunque le entità, anche a dati identici,
+        per togliere il marcatore.
+        """
+        self.stale = True
+        self.always_update = True
+        self._diverged = True
+        self.async_set_updated_data(self._index(data))
+
+    async def async_request_resync(self) -> None:
+        """Refresh che rilegge i dati del bridge anche se identici all'ultimo polling."""
+        self._diverged = True
+        await self.async_request_refresh()
+
+    async def _timed(self, name: str, call: Awaitable) -> Any:
+        start = time.monotonic()
+        try:
+            return await call
+        finally:
+            self.last_timings[name] = time.monotonic() - start
+
+    def get(self, key) -> Optional[Record]:
+        """Record per id (None se sconosciuto)."""
+        if self.data is None:
+            return None
+        return self.data.get(key)
+
+    def _index(self, records: Dict[Any, Record]) -> Dict[Any, Record]:
+        """Registra le impronte dei record appena normalizzati."""
+        self.fingerprints = {key: record.fingerprint for key, record in records.items()}
+        return records
+
+    @callback
+    def async_add_keyed_listener(self, key, update_callback: CALLBACK_TYPE) -> Callable[[], None]:
+        """Registra un listener per gli aggiornamenti di un singolo id."""
+        self._keyed_listeners.setdefault(key, []).append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            callbacks = self._keyed_listeners.get(key)
+            if callbacks and update_callback in callbacks:
+                callbacks.remove(update_callback)
+                if not callbacks:
+                    del self._keyed_listeners[key]
+
+        return remove_listener
+
+    @callback
+    def async_add_record_listener(self, update_callback: CALLBACK_TYPE) -> Callable[[], None]:
+        """Registra un listener chiamato a ogni record modificato da async_set_record."""
+        self._record_listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            if update_callback in self._record_listeners:
+                self._record_listeners.remove(update_callback)
+
+        return remove_listener
+
+    @callback
+    def async_update_keyed_listeners(self, key) -> None:
+        """Notifica solo le entità dell'id indicato."""
+        callbacks = list(self._keyed_listeners.get(key, ()))
+        self.metrics.observe_notified(len(callbacks))
+        for update_callback in callbacks:
+            update_callback()
+
+    @callback
+    def async_set_record(self, key, record: Record, force: bool = False) -> None:
+        """Aggiorna un record e notifica le sue entità se il contenuto è cambiato."""
+        if self.data is None:
+            return
+        self.data[key] = record
+        self._diverged = True
+        fingerprint = record.fingerprint
+        if force or fingerprint != self.fingerprints.get(key):
+            self.fingerprints[key] = fingerprint
+            self.async_update_keyed_listeners(key)
+            for update_callback in list(self._record_listeners):
+                update_callback()
+
+    @callback
+    def handle_event(self, key, new_state: Dict[str, Any]) -> None:
+        """Applica lo stato ricevuto da un evento SSE."""
+        record = self.get(key)
+        if record is None:
+            if self.data is not None:
+                # Id sconosciuto: zona o dispositivo nuovo, la lista completa lo porterà
+                _LOGGER.debug("Evento SSE per id sconosciuto %s, aggiorno %s", key, self.name)
+                self.hass.async_create_task(self.async_request_refresh())
+            return
+        self.async_set_record(key, record.with_state(new_state))
+
+
+class TadoLocalZoneCoordinator(TadoLocalCoordinator):
+    """Stato delle zone: cadenza veloce, adattata allo stato dello stream SSE."""
+
+    def __init__(
+        self, hass: HomeAssistant, client: TadoLocalClient, interval: int, push_only: bool = False
+    ) -> None:
+        super().__init__(hass, client, "tado_local_zones", timedelta(seconds=interval))
+        self._base_interval = timedelta(seconds=interval)
+        # Con push_only il polling si sospende del tutto mentre lo stream SSE è connesso
+        self.push_only = push_only
+        self.push_connected = False
+
+    def _apply_poll_interval(self) -> None:
+        if not self.push_connected:
+            self.update_interval = self._base_interval
+        elif self.push_only:
+            self.update_interval = None
+        else:
+            self.update_interval = self._base_interval * PUSH_POLL_MULTIPLIER
+        self._async_unsub_refresh()
+        if self._listeners:
+            self._schedule_refresh()
+
+    @callback
+    def async_set_poll_options(self, interval: int, push_only: bool) -> None:
+        """Applica intervallo e modalità push_only modificati dalle opzioni."""
+        self._base_interval = timedelta(seconds=interval)
+        self.push_only = push_only
+        self._apply_poll_interval()
+
+    @callback
+    def async_set_push_connected(self, connected: bool, refresh: bool = True) -> None:
+        """Adatta il polling allo stato dello stream SSE.
+
+        `refresh=False` quando chi chiude lo stream ha già chiesto un riallineamento.
+        """
+        if connected == self.push_connected:
+            return
+        self.push_connected = connected
+        self._apply_poll_interval()
+        if not connected and refresh:
+            # Stream perso: i dati potrebbero essere vecchi, si riallinea subito
+            self.hass.async_create_task(self.async_request_refresh())
+
+    def hot_water_zone_ids(self) -> List[Any]:
+        """Id delle zone acqua calda note."""
+        if self.data is None:
+            return []
+        return [zid for zid, zone in self.data.items() if zone.is_hot_water]
+
+    async def _async_fetch_data(self) -> Dict[Any, Zone]:
+        self.last_timings = {}
+        try:
+            async with async_timeout.timeout(REFRESH_TIMEOUT):
+                result = await self._timed("/zones", self.client.async_poll_zones())
+        except Exception as err:
+            raise UpdateFailed(f"Errore di connessione: {err}") from err
+
+        _LOGGER.debug("Refresh zone Tado Local completato: %s", self.last_timings)
+        if self.data is not None and not result.changed and not self._reparse:
+            # Risposta identica e nessun record modificato da allora: niente normalizzazione né notifiche
+            return self.data
+        # Record normalizzati e indicizzati una volta per refresh: letture O(1) nelle entità
+        return self._index(parse_zones(result.data))
+
+    async def async_refresh_zone(self, zone_id) -> None:
+        """Riallinea una sola zona (es. dopo un comando) e notifica solo le sue entità."""
+        if self.data is None:
+            return
+        try:
+            zone = await self._timed(f"/zones/{zone_id}", self.client.async_get_zone(zone_id))
+        except Exception as err:
+            _LOGGER.debug("Errore aggiornamento zona %s: %s", zone_id, err)
+            return
+        zone = Zone.from_payload(zone) if zone is not None else None
+        if zone is not None:
+            # Notifica anche senza cambiamenti: vale come conferma del comando
+            self.async_set_record(zone_id, zone, force=True)
+
+
+class TadoLocalDeviceCoordinator(TadoLocalCoordinator):
+    """Inventario dei dispositivi: cadenza lenta, la batteria arriva anche via SSE."""
+
+    def __init__(self, hass: HomeAssistant, client: TadoLocalClient) -> None:
+        super().__init__(hass, client, "tado_local_devices", DEVICE_UPDATE_INTERVAL)
+
+    async def _async_fetch_data(self) -> Dict[Any, Device]:
+        self.last_timings = {}
+        try:
+            async with async_timeout.timeout(REFRESH_TIMEOUT):
+                result = await self._timed("/devices", self.client.async_poll_devices())
+        except Exception as err:
+            raise UpdateFailed(f"Errore di connessione: {err}") from err
+
+        if self.data is not None and not result.changed and not self._reparse:
+            return self.data
+        return self._index(parse_devices(result.data))
+
+
+class TadoLocalHotWaterCoordinator(TadoLocalCoordinator):
+    """Cache dei dettagli acqua calda (/hot_water/{id}) per le zone HOT_WATER note.
+
+    Il refresh completo avviene solo alla scadenza del TTL delle capacità; lo stato
+    di una zona si riscarica quando la zona cambia (polling o evento SSE). A regime,
+    senza cambiamenti, non parte nessuna chiamata.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        client: TadoLocalClient,
+        zone_coordinator: TadoLocalZoneCoordinator,
+    ) -> None:
+        super().__init__(hass, client, "tado_local_hot_water", HOT_WATER_CAPABILITY_TTL)
+        self.zone_coordinator = zone_coordinator
+        # Impronta della zona base al momento dell'ultimo scaricamento del dettaglio
+        self._zone_fingerprints: Dict[Any, Optional[tuple]] = {}
+        self._inflight: Set[Any] = set()
+        self._dirty: Set[Any] = set()
+        self._zone_unsubs: Dict[Any, Callable[[], None]] = {}
+
+    @callback
+    def async_track_zones(self) -> Callable[[], None]:
+        """Segue i cambiamenti delle zone acqua calda; restituisce la funzione di disiscrizione."""
+        unsub_zones = self.zone_coordinator.async_add_listener(self._async_zones_updated)
+        self._async_sync_zone_listeners()
+
+        @callback
+        def unsubscribe() -> None:
+            unsub_zones()
+            for unsub in self._zone_unsubs.values():
+                unsub()
+            self._zone_unsubs.clear()
+
+        return unsubscribe
+
+    @callback
+    def _async_sync_zone_listeners(self) -> None:
+        """Allinea i listener per zona alle zone acqua calda attuali."""
+        zone_ids = set(self.zone_coordinator.hot_water_zone_ids())
+        for zone_id in set(self._zone_unsubs) - zone_ids:
+            self._zone_unsubs.pop(zone_id)()
+        for zone_id in zone_ids - set(self._zone_unsubs):
+            self._zone_unsubs[zone_id] = self.zone_coordinator.async_add_keyed_listener(
+                zone_id, partial(self._async_zone_updated, zone_id)
+            )
+
+    @callback
+    def _async_zones_updated(self) -> None:
+        self._async_sync_zone_listeners()
+        if self.data is not None and set(self.data) != set(self._zone_unsubs):
+            # Zone acqua calda aggiunte o rimosse: si riscarica l'elenco completo
+            self.hass.async_create_task(self.async_request_refresh())
+            return
+        for zone_id in self._zone_unsubs:
+            self._async_zone_updated(zone_id)
+
+    @callback
+    def _async_zone_updated(self, zone_id) -> None:
+        fingerprint = self.zone_coordinator.fingerprints.get(zone_id)
+        if self.data is None or self._zone_fingerprints.get(zone_id) == fingerprint:
+            return
+        if zone_id in self._inflight:
+            self._dirty.add(zone_id)
+            return
+        self.hass.async_create_task(self._async_refetch(zone_id))
+
+    async def _async_refetch(self, zone_id) -> None:
+        self._inflight.add(zone_id)
+        try:
+            await self.async_refresh_zone(zone_id, force=False)
+        finally:
+            self._inflight.discard(zone_id)
+        if zone_id in self._dirty:
+            self._dirty.discard(zone_id)
+            self._async_zone_updated(zone_id)
+
+    async def _async_fetch_zone(self, zone_id) -> Any:
+        return await self._timed(f"/hot_water/{zone_id}", self.client.async_poll_hot_water(zone_id))
+
+    async def _async_fetch_data(self) -> Dict[Any, HotWater]:
+        self.last_timings = {}
+        zone_ids = self.zone_coordinator.hot_water_zone_ids()
+        try:
+            async with async_timeout.timeout(REFRESH_TIMEOUT):
+                results = await asyncio.gather(
+                    *(self._async_fetch_zone(zid) for zid in zone_ids), return_exceptions=True
+                )
+        except Exception as err:
+            raise UpdateFailed(f"Errore di connessione: {err}") from err
+
+        previous = self.data or {}
+        data: Dict[Any, HotWater] = {}
+        changed = set(previous) != set(zone_ids)
+        failures = 0
+        for zid, result in zip(zone_ids, results):
+            self._zone_fingerprints[zid] = self.zone_coordinator.fingerprints.get(zid)
+            if isinstance(result, Exception):
+                # Un hot water lento o in errore non blocca gli altri: resta l'ultimo dato
+                _LOGGER.debug("Errore caricamento hot water %s: %s", zid, result)
+                failures += 1
+                if zid in previous:
+                    data[zid] = previous[zid]
+                continue
+            changed = changed or result.changed
+            if not result.changed and not self._reparse and zid in previous:
+                data[zid] = previous[zid]
+            else:
+                data[zid] = HotWater.from_payload(zid, result.data)
+
+        if zone_ids and failures == len(zone_ids):
+            raise UpdateFailed("Errore di connessione: nessun dettaglio acqua calda disponibile")
+        if self.data is not None and not changed and not self._reparse:
+            return self.data
+        return self._index(data)
+
+    async def async_refresh_zone(self, zone_id, force: bool = True) -> None:
+        """Riallinea il dettaglio di una sola zona acqua calda."""
+        if self.data is None:
+            return
+        self._zone_fingerprints[zone_id] = self.zone_coordinator.fingerprints.get(zone_id)
+        try:
+            result = await self._async_fetch_zone(zone_id)
+        except Exception as err:
+            _LOGGER.debug("Errore aggiornamento hot water %s: %s", zone_id, err)
+            return
+        self.async_set_record(zone_id, HotWater.from_payload(zone_id, result.data), force=force)
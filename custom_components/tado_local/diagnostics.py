@@ -0,0 +1,66 @@
+"""Diagnostica della config entry Tado Local."""
+from typing import Any, Dict
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import CONF_FALLBACK_HOSTS, CONF_IP_ADDRESS, DOMAIN
+
+TO_REDACT = {CONF_IP_ADDRESS, CONF_FALLBACK_HOSTS, "serial_number"}
+
+
+def _coordinator_info(coordinator) -> Dict[str, Any]:
+    return {
+        "last_update_success": coordinator.last_update_success,
+        "update_interval": coordinator.update_interval.total_seconds() if coordinator.update_interval else None,
+        "records": len(coordinator.data or {}),
+        "last_timings": coordinator.last_timings,
+    }
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> Dict[str, Any]:
+    """Metriche di prestazione e stato dei coordinator e dello stream SSE."""
+    data = hass.data[DOMAIN][entry.entry_id]
+    event_stream = data["event_stream"]
+    client = data["client"]
+    return {
+        "entry": {
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": async_redact_data(dict(entry.options), TO_REDACT),
+        },
+        "coordinators": {
+            "zones": _coordinator_info(data["zone_coordinator"]),
+            "devices": _coordinator_info(data["device_coordinator"]),
+            "hot_water": _coordinator_info(data["hot_water_coordinator"]),
+        },
+        "event_stream": {
+            "state": event_stream.state,
+            "last_event_id": event_stream.last_event_id,
+            "resyncs": event_stream.resync_count,
+            "max_silence": event_stream.max_silence,
+        },
+        # Gli URL contengono gli IP: si riporta solo la posizione nella configurazione
+        "endpoints": [
+            {
+                "index": index,
+                "active": endpoint.url == client.base_url,
+                "healthy": endpoint.healthy,
+                "latency": endpoint.latency,
+                "failures": endpoint.failures,
+            }
+            for index, endpoint in enumerate(client.endpoints)
+        ],
+        "metrics": client.metrics.as_dict(),
+        "commands": data["commands"].as_dict(),
+        "zone_history": {
+            "zones": len(data["zone_history"].zones),
+            "samples": sum(len(history) for history in data["zone_history"].zones.values()),
+        },
+        "zones": async_redact_data(
+            [zone.as_dict() for zone in (data["zone_coordinator"].data or {}).values()], TO_REDACT
+        ),
+        "devices": async_redact_data(
+            [device.as_dict() for device in (data["device_coordinator"].data or {}).values()], TO_REDACT
+        ),
+    }
@@ -0,0 +1,241 @@
+"""Entità base Tado Local."""
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .const import DOMAIN
+from .coordinator import Record, TadoLocalCoordinator
+from .models import Device, Zone
+
+_LOGGER = logging.getLogger(__name__)
+
+# Tempo massimo (s) per la conferma di un comando prima di annullare lo stato ottimistico
+OPTIMISTIC_CONFIRM_TIMEOUT = 15
+# Un record sparito dal bridge viene ritirato solo dopo questi aggiornamenti e secondi di assenza
+REMOVAL_GRACE_REFRESHES = 3
+REMOVAL_GRACE_PERIOD = 600
+# Scarto (°C) entro cui la temperatura riportata dal bridge conferma quella richiesta
+TEMPERATURE_TOLERANCE = 0.1
+
+
+def values_match(current: Any, requested: Any) -> bool:
+    """Confronta un valore del record con quello richiesto (temperature arrotondate dal bridge)."""
+    if isinstance(requested, float) and isinstance(current, (int, float)):
+        return abs(current - requested) < TEMPERATURE_TOLERANCE
+    return current == requested
+
+
+@callback
+def async_setup_record_entities(
+    hass: HomeAssistant,
+    entry: ConfigEntry,
+    coordinator: TadoLocalCoordinator,
+    async_add_entities: AddEntitiesCallback,
+    platform: str,
+    device_kind: str,
+    create_entities: Callable[[Record], List[Entity]],
+) -> None:
+    """Crea le entità di ogni record e segue i record aggiunti o rimossi dal bridge.
+
+    A ogni aggiornamento del coordinator si confrontano gli id: si creano solo le
+    entità dei nuovi record e si ritirano quelle sparite, senza ricaricare
+    l'integrazione. Un id si considera rimosso solo se manca da almeno
+    `REMOVAL_GRACE_REFRESHES` aggiornamenti e `REMOVAL_GRACE_PERIOD` secondi: un
+    bridge che si riavvia e risponde con una lista vuota o parziale non cancella nulla.
+    """
+    entities: Dict[Any, List[Entity]] = {}
+    # Id assenti dagli ultimi aggiornamenti: (primo istante di assenza, aggiornamenti consecutivi)
+    missing: Dict[Any, Tuple[float, int]] = {}
+
+    @callback
+    def async_sync() -> None:
+        if coordinator.data is None:
+            return
+        added: List[Entity] = []
+        for key, record in coordinator.data.items():
+            missing.pop(key, None)
+            if key not in entities:
+                entities[key] = create_entities(record)
+                added.extend(entities[key])
+        if added:
+            async_add_entities(added)
+
+        if not coordinator.data or coordinator.stale:
+            # Lista vuota (bridge in riavvio) o dati dello snapshot: nessuna rimozione
+            return
+        now = time.monotonic()
+        removed = []
+        for key in entities:
+            if key in coordinator.data:
+                continue
+            since, count = missing.get(key, (now, 0))
+            missing[key] = (since, count + 1)
+            if count + 1 >= REMOVAL_GRACE_REFRESHES and now - since >= REMOVAL_GRACE_PERIOD:
+                removed.append(key)
+        if not removed:
+            return
+        device_registry = dr.async_get(hass)
+        for key in removed:
+            _LOGGER.debug("Tado Local: %s %s rimosso dal bridge", device_kind, key)
+            missing.pop(key, None)
+            for entity in entities.pop(key):
+                hass.async_create_task(entity.async_remove())
+            # Il dispositivo perde la config entry: HA ritira le entità collegate e ne
+            # conserva le personalizzazioni nel caso il record ricompaia
+            device = device_registry.async_get_device(identifiers={(DOMAIN, device_kind, key)})
+            if device is not None and entry.entry_id in device.config_entries:
+                device_registry.async_update_device(device.id, remove_config_entry_id=entry.entry_id)
+
+    async_sync()
+    entry.async_on_unload(coordinator.async_add_listener(async_sync))
+
+
+class TadoLocalEntity(CoordinatorEntity):
+    """Entità legata a un record (id) del coordinator.
+
+    Riceve solo gli eventi SSE del proprio id e scrive lo stato solo quando
+    il record è cambiato.
+    """
+
+    coordinator: TadoLocalCoordinator
+
+    def __init__(self, coordinator: TadoLocalCoordinator, key: Any) -> None:
+        super().__init__(coordinator)
+        self._key = key
+        self._written_key: Optional[Tuple[Any, bool, bool]] = None
+
+    @property
+    def record(self) -> Optional[Record]:
+        """Record attuale dell'entità (None se il bridge non lo riporta più)."""
+        return self.coordinator.get(self._key)
+
+    def _fingerprint(self) -> Any:
+        """Impronta dei dati mostrati dall'entità."""
+        return self.coordinator.fingerprints.get(self._key)
+
+    def _state_key(self) -> Tuple[Any, bool, bool]:
+        return (self._fingerprint(), self.available, self.coordinator.stale)
+
+    @property
+    def extra_state_attributes(self) -> Optional[Dict[str, Any]]:
+        """`stale` finché lo stato viene dallo snapshot e non ancora dal bridge."""
+        if self.coordinator.stale:
+            return {"stale": True}
+        return None
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self._written_key = self._state_key()
+        self.async_on_remove(
+            self.coordinator.async_add_keyed_listener(self._key, self._handle_coordinator_update)
+        )
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        key = self._state_key()
+        metrics = self.coordinator.metrics
+        if key == self._written_key:
+            metrics.state_writes_skipped += 1
+            return
+        self._written_key = key
+        metrics.state_writes += 1
+        super()._handle_coordinator_update()
+
+
+class TadoLocalZoneEntity(TadoLocalEntity):
+    """Entità legata a una zona.
+
+    Supporta uno stato ottimistico (`_optimistic`) applicato subito dopo un comando:
+    lo conferma solo un aggiornamento in cui il record riporta i valori richiesti.
+    Gli aggiornamenti diversi (es. la lettura dello stato di prima del comando) lo
+    lasciano in piedi; se la conferma non arriva entro `OPTIMISTIC_CONFIRM_TIMEOUT`
+    si torna ai dati del coordinator.
+    """
+
+    def __init__(self, coordinator: TadoLocalCoordinator, zone: Zone) -> None:
+        self._zone_id = zone.zone_id
+        super().__init__(coordinator, self._zone_id)
+        # Calcolato una volta alla normalizzazione del record
+        self._attr_device_info = zone.device_info
+        self._optimistic: Dict[str, Any] = {}
+        self._optimistic_sent = False
+        self._unsub_confirm: Optional[CALLBACK_TYPE] = None
+
+    @callback
+    def _async_set_optimistic(self, values: Dict[str, Any]) -> None:
+        """Mostra subito i valori richiesti, in attesa dell'invio del comando."""
+        self._cancel_confirm_timeout()
+        self._optimistic = values
+        self._optimistic_sent = False
+        self.async_write_ha_state()
+
+    @callback
+    def _async_optimistic_sent(self) -> None:
+        """Il comando è stato accettato: il prossimo aggiornamento fa da conferma."""
+        if not self._optimistic:
+            return
+        self._optimistic_sent = True
+        self._cancel_confirm_timeout()
+        self._unsub_confirm = async_call_later(
+            self.hass, OPTIMISTIC_CONFIRM_TIMEOUT, self._async_confirm_timeout
+        )
+
+    @callback
+    def _async_rollback_optimistic(self) -> None:
+        """Torna ai dati del coordinator (comando fallito o non confermato)."""
+        self._cancel_confirm_timeout()
+        if not self._optimistic:
+            return
+        self._optimistic = {}
+        self._optimistic_sent = False
+        self._written_key = None
+        self.async_write_ha_state()
+
+    def _optimistic_confirmed(self) -> bool:
+        """Il record riporta i valori richiesti (confronto campo per campo)."""
+        record = self.record
+        return record is not None and all(
+            values_match(getattr(record, field, None), value) for field, value in self._optimistic.items()
+        )
+
+    @callback
+    def _async_confirm_timeout(self, _now) -> None:
+        self._unsub_confirm = None
+        self._async_rollback_optimistic()
+
+    def _cancel_confirm_timeout(self) -> None:
+        if self._unsub_confirm is not None:
+            self._unsub_confirm()
+            self._unsub_confirm = None
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        if self._optimistic_sent and self._optimistic_confirmed():
+            # Il bridge riporta i valori richiesti: lo stato ottimistico diventa reale
+            self._cancel_confirm_timeout()
+            self._optimistic = {}
+            self._optimistic_sent = False
+            self._written_key = None
+        super()._handle_coordinator_update()
+
+    async def async_will_remove_from_hass(self) -> None:
+        self._cancel_confirm_timeout()
+        await super().async_will_remove_from_hass()
+
+
+class TadoLocalDeviceEntity(TadoLocalEntity):
+    """Entità legata a un dispositivo."""
+
+    def __init__(self, coordinator: TadoLocalCoordinator, device: Device) -> None:
+        self._device_id = device.device_id
+        super().__init__(coordinator, self._device_id)
+        # Calcolato una volta alla normalizzazione del record
+        self._attr_device_info = device.device_info
@@ -0,0 +1,320 @@
+"""Storico in memoria delle zone e statistiche di riscaldamento derivate.
+
+Ogni zona ha buffer circolari a dimensione fissa (array di float) con temperatura,
+umidità, target e riscaldamento, alimentati da polling ed eventi SSE. Duty cycle e
+trend sulla finestra mobile sono mantenuti con somme incrementali: un campione costa
+O(1) e nessuna statistica passa dal recorder.
+"""
+import math
+import time
+from array import array
+from datetime import timedelta
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.util import dt as dt_util
+
+from .coordinator import TadoLocalZoneCoordinator
+from .models import ZoneState
+
+# Campioni per zona (uno a ogni cambiamento della zona)
+HISTORY_SIZE = 720
+# Finestra mobile (s) di duty cycle e trend
+ANALYTICS_WINDOW = 3600
+# Ampiezza minima (s) dei campioni per stimare il trend
+TREND_MIN_SPAN = 600
+# I valori derivati dipendono anche dal tempo trascorso: i sensori si aggiornano periodicamente
+ANALYTICS_UPDATE_INTERVAL = timedelta(minutes=1)
+
+
+def _buffer(size: int) -> array:
+    return array("d", [math.nan]) * size
+
+
+def _local_day(timestamp: float) -> Tuple[float, float]:
+    """Inizio e fine (timestamp) del giorno locale che contiene `timestamp`."""
+    start = dt_util.start_of_local_day(dt_util.as_local(dt_util.utc_from_timestamp(timestamp)))
+    end = dt_util.start_of_local_day(start.date() + timedelta(days=1))
+    return start.timestamp(), end.timestamp()
+
+
+class ZoneHistory:
+    """Buffer circolari di una zona e statistiche incrementali sulla finestra mobile."""
+
+    __slots__ = (
+        "size", "times", "cur_temp", "hum", "target", "heating", "_start", "_count",
+        "_span", "_heating_span", "_origin", "_n", "_st", "_sy", "_stt", "_sty",
+        "_day_start", "_day_end", "_heating_today", "_last_heating",
+    )
+
+    def __init__(self, size: int = HISTORY_SIZE) -> None:
+        self.size = size
+        self.times = _buffer(size)
+        self.cur_temp = _buffer(size)
+        self.hum = _buffer(size)
+        self.target = _buffer(size)
+        self.heating = _buffer(size)
+        self._start = 0
+        self._count = 0
+        # Durata totale e in riscaldamento degli intervalli tra i campioni
+        self._span = 0.0
+        self._heating_span = 0.0
+        # Somme della regressione lineare della temperatura (tempi relativi a _origin)
+        self._origin = 0.0
+        self._n = 0
+        self._st = self._sy = self._stt = self._sty = 0.0
+        self._day_start = self._day_end = 0.0
+        self._heating_today = 0.0
+        self._last_heating: Optional[float] = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _slot(self, index: int) -> int:
+        """Posizione nel buffer dell'index-esimo campione, dal più vecchio."""
+        return (self._start + index) % self.size
+
+    @property
+    def is_heating(self) -> bool:
+        return self._count > 0 and self.heating[self._slot(self._count - 1)] > 0
+
+    def record(self, timestamp: float, state: ZoneState) -> None:
+        """Aggiunge un campione: O(1), salvo il riallineamento periodico delle somme."""
+        if self._count:
+            last = self._slot(self._count - 1)
+            timestamp = max(timestamp, self.times[last])
+            elapsed = timestamp - self.times[last]
+            self._span += elapsed
+            if self.heating[last] > 0:
+                self._heating_span += elapsed
+                self._last_heating = timestamp
+        self._heating_today = self.heating_today(timestamp)
+        if not self._day_start <= timestamp < self._day_end:
+            self._day_start, self._day_end = _local_day(timestamp)
+
+        if self._count == self.size:
+            self._evict()
+        slot = self._slot(self._count)
+        self._count += 1
+        self.times[slot] = timestamp
+        self.cur_temp[slot] = math.nan if state.cur_temp_c is None else state.cur_temp_c
+        self.hum[slot] = math.nan if state.hum_perc is None else state.hum_perc
+        self.target[slot] = math.nan if state.target_temp_c is None else state.target_temp_c
+        self.heating[slot] = 1.0 if (state.cur_heating or 0) > 0 else 0.0
+        self._add_trend(slot, 1)
+        self._prune(timestamp)
+        if timestamp - self._origin > ANALYTICS_WINDOW:
+            # Tempi relativi piccoli: le somme dei quadrati restano precise
+            self._rebase(timestamp)
+
+    def _add_trend(self, slot: int, sign: int) -> None:
+        value = self.cur_temp[slot]
+        if math.isnan(value):
+            return
+        offset = self.times[slot] - self._origin
+        self._n += sign
+        self._st += sign * offset
+        self._sy += sign * value
+        self._stt += sign * offset * offset
+        self._sty += sign * offset * value
+
+    def _rebase(self, origin: float) -> None:
+        """Ricalcola le somme dal buffer con una nuova origine dei tempi (al più una volta per finestra)."""
+        self._origin = origin
+        self._n = 0
+        self._st = self._sy = self._stt = self._sty = 0.0
+        self._span = self._heating_span = 0.0
+        for index in range(self._count):
+            slot = self._slot(index)
+            self._add_trend(slot, 1)
+            if index:
+                previous = self._slot(index - 1)
+                elapsed = self.times[slot] - self.times[previous]
+                self._span += elapsed
+                if self.heating[previous] > 0:
+                    self._heating_span += elapsed
+
+    def _evict(self) -> None:
+        """Toglie il campione più vecchio e il suo intervallo dalle somme."""
+        first = self._slot(0)
+        if self._count > 1:
+            elapsed = self.times[self._slot(1)] - self.times[first]
+            self._span -= elapsed
+            if self.heating[first] > 0:
+                self._heating_span -= elapsed
+        self._add_trend(first, -1)
+        self._start = (self._start + 1) % self.size
+        self._count -= 1
+
+    def _prune(self, now: float) -> None:
+        """Esclude gli intervalli terminati prima della finestra mobile."""
+        window_start = now - ANALYTICS_WINDOW
+        while self._count > 1 and self.times[self._slot(1)] <= window_start:
+            self._evict()
+
+    def duty_cycle(self, now: float) -> Optional[float]:
+        """Percentuale di tempo in riscaldamento nell'ultima finestra."""
+        if not self._count:
+            return None
+        self._prune(now)
+        first = self._slot(0)
+        last = self._slot(self._count - 1)
+        # Intervallo aperto dall'ultimo campione a ora, stato invariato
+        open_span = max(now - self.times[last], 0.0)
+        span = self._span + open_span
+        heating_span = self._heating_span + (open_span if self.heating[last] > 0 else 0.0)
+        # Il primo intervallo può iniziare prima della finestra: se ne conta solo la parte interna
+        outside = now - ANALYTICS_WINDOW - self.times[first]
+        if outside > 0:
+            span -= outside
+            if self.heating[first] > 0:
+                heating_span -= outside
+        if span <= 0:
+            return None
+        return min(max(heating_span / span * 100, 0.0), 100.0)
+
+    def trend(self, now: float) -> Optional[float]:
+        """Pendenza della temperatura (°C/h) per regressione lineare sulla finestra."""
+        if not self._count:
+            return None
+        self._prune(now)
+        if self._n < 2:
+            return None
+        if self.times[self._slot(self._count - 1)] - self.times[self._slot(0)] < TREND_MIN_SPAN:
+            return None
+        denominator = self._n * self._stt - self._st * self._st
+        if denominator <= 0:
+            return None
+        return (self._n * self._sty - self._st * self._sy) / denominator * 3600
+
+    def heating_today(self, now: float) -> float:
+        """Secondi di riscaldamento dall'inizio del giorno locale."""
+        if self._day_start <= now < self._day_end:
+            total = self._heating_today
+            day_start = self._day_start
+        else:
+            total = 0.0
+            day_start = _local_day(now)[0]
+        if self.is_heating:
+            total += max(now - max(self.times[self._slot(self._count - 1)], day_start), 0.0)
+        return total
+
+    def time_since_heating(self, now: float) -> Optional[float]:
+        """Secondi dall'ultima volta in riscaldamento (0 se sta riscaldando)."""
+        if self.is_heating:
+            return 0.0
+        if self._last_heating is None:
+            return None
+        return max(now - self._last_heating, 0.0)
+
+    def as_dict(self, now: float) -> Dict[str, Any]:
+        """Contatori da conservare tra i riavvii (i campioni restano solo in memoria)."""
+        return {
+            "heating_today": self.heating_today(now),
+            "last_heating": now if self.is_heating else self._last_heating,
+            "saved_at": now,
+        }
+
+    def restore(self, saved: Dict[str, Any]) -> None:
+        saved_at = saved.get("saved_at")
+        if saved_at is None:
+            return
+        self._day_start, self._day_end = _local_day(saved_at)
+        self._heating_today = saved.get("heating_today") or 0.0
+        self._last_heating = saved.get("last_heating")
+
+
+class TadoLocalZoneHistory:
+    """Storico delle zone di una config entry, alimentato dal coordinator delle zone."""
+
+    def __init__(self, hass: HomeAssistant, zone_coordinator: TadoLocalZoneCoordinator) -> None:
+        self.hass = hass
+        self.zone_coordinator = zone_coordinator
+        self.zones: Dict[Any, ZoneHistory] = {}
+        # Impronta della zona all'ultimo campione: polling e SSE non registrano doppioni
+        self._fingerprints: Dict[Any, tuple] = {}
+        self._zone_unsubs: Dict[Any, Callable[[], None]] = {}
+        self._listeners: List[CALLBACK_TYPE] = []
+
+    def get(self, zone_id) -> Optional[ZoneHistory]:
+        return self.zones.get(zone_id)
+
+    @callback
+    def async_track(self) -> Callable[[], None]:
+        """Campiona le zone a ogni cambiamento; restituisce la funzione di disiscrizione.
+
+        Va chiamato prima di creare le entità, così i listener dello storico
+        precedono quelli dei sensori che lo leggono.
+        """
+        unsub_zones = self.zone_coordinator.async_add_listener(self._async_zones_updated)
+        unsub_tick = async_track_time_interval(self.hass, self._async_tick, ANALYTICS_UPDATE_INTERVAL)
+        self._async_zones_updated()
+
+        @callback
+        def unsubscribe() -> None:
+            unsub_zones()
+            unsub_tick()
+            for unsub in self._zone_unsubs.values():
+                unsub()
+            self._zone_unsubs.clear()
+
+        return unsubscribe
+
+    @callback
+    def async_add_listener(self, update_callback: CALLBACK_TYPE) -> Callable[[], None]:
+        """Registra un listener chiamato a ogni aggiornamento periodico dei valori derivati."""
+        self._listeners.append(update_callback)
+
+        @callback
+        def remove_listener() -> None:
+            if update_callback in self._listeners:
+                self._listeners.remove(update_callback)
+
+        return remove_listener
+
+    @callback
+    def _async_tick(self, _now) -> None:
+        for update_callback in list(self._listeners):
+            update_callback()
+
+    @callback
+    def _async_zones_updated(self) -> None:
+        zone_ids = set(self.zone_coordinator.data or ())
+        for zone_id in set(self._zone_unsubs) - zone_ids:
+            self._zone_unsubs.pop(zone_id)()
+            self.zones.pop(zone_id, None)
+            self._fingerprints.pop(zone_id, None)
+        for zone_id in zone_ids - set(self._zone_unsubs):
+            self._zone_unsubs[zone_id] = self.zone_coordinator.async_add_keyed_listener(
+                zone_id, partial(self._async_sample, zone_id)
+            )
+        for zone_id in zone_ids:
+            self._async_sample(zone_id)
+
+    @callback
+    def _async_sample(self, zone_id) -> None:
+        if self.zone_coordinator.stale:
+            # Dati dello snapshot: non sono misure attuali
+            return
+        zone = self.zone_coordinator.get(zone_id)
+        if zone is None or self._fingerprints.get(zone_id) == zone.fingerprint:
+            return
+        self._fingerprints[zone_id] = zone.fingerprint
+        history = self.zones.get(zone_id)
+        if history is None:
+            history = self.zones[zone_id] = ZoneHistory()
+        history.record(time.time(), zone.state)
+
+    def as_saved(self) -> List[List[Any]]:
+        """Contatori per zona, come coppie [id, dati] (le chiavi JSON sono stringhe)."""
+        now = time.time()
+        return [[zone_id, history.as_dict(now)] for zone_id, history in self.zones.items()]
+
+    def restore(self, saved: List[List[Any]]) -> None:
+        for zone_id, data in saved:
+            history = self.zones.get(zone_id)
+            if history is None:
+                history = self.zones[zone_id] = ZoneHistory()
+            history.restore(data)
@@ -0,0 +1,194 @@
+"""Metriche di prestazione dell'integrazione, in memoria limitata.
+
+Tutte le strutture hanno dimensione fissa (istogrammi a bucket, contatori,
+finestra circolare per il rate degli eventi): la memoria non cresce con il tempo.
+"""
+import time
+from typing import Any, Dict, Optional, Sequence
+
+# Bucket (secondi) per latenze di richieste, refresh ed eventi
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# Bucket per il numero di entità notificate a ogni aggiornamento
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+# Finestra (secondi) su cui si calcolano gli eventi/s
+RATE_WINDOW = 60
+
+
+def endpoint_label(path: str) -> str:
+    """Raggruppa i percorsi per id: /hot_water/3 -> /hot_water/*, /zones/3/set -> /zones/*/set."""
+    parts = path.split("/")
+    if len(parts) > 2:
+        parts[2] = "*"
+    return "/".join(parts)
+
+
+class Histogram:
+    """Istogramma a bucket fissi con conteggio, somma e massimo."""
+
+    __slots__ = ("bounds", "counts", "count", "total", "max", "last")
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS) -> None:
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last: Optional[float] = None
+
+    def observe(self, value: float) -> None:
+        index = 0
+        for bound in self.bounds:
+            if value <= bound:
+                break
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        self.last = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Stima del percentile (limite superiore del bucket che lo contiene)."""
+        if not self.count:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return self.bounds[index] if index < len(self.bounds) else self.max
+        return self.max
+
+    def as_dict(self) -> Dict[str, Any]:
+        buckets = {f"le_{bound}": count for bound, count in zip(self.bounds, self.counts)}
+        buckets["inf"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "avg": self.total / self.count if self.count else None,
+            "max": self.max if self.count else None,
+            "last": self.last,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "buckets": buckets,
+        }
+
+
+class RateMeter:
+    """Eventi al secondo su una finestra circolare di `RATE_WINDOW` secondi."""
+
+    __slots__ = ("_slots", "_seconds")
+
+    def __init__(self, window: int = RATE_WINDOW) -> None:
+        self._slots = [0] * window
+        self._seconds = [0] * window
+
+    def mark(self, now: Optional[float] = None) -> None:
+        second = int(now if now is not None else time.monotonic())
+        index = second % len(self._slots)
+        if self._seconds[index] != second:
+            self._seconds[index] = second
+            self._slots[index] = 0
+        self._slots[index] += 1
+
+    def rate(self, now: Optional[float] = None) -> float:
+        second = int(now if now is not None else time.monotonic())
+        window = len(self._slots)
+        total = sum(
+            count for count, slot_second in zip(self._slots, self._seconds) if second - slot_second < window
+        )
+        return total / window
+
+
+class TadoLocalMetrics:
+    """Raccoglie le metriche di una config entry."""
+
+    def __init__(self) -> None:
+        self.requests: Dict[str, Histogram] = {}
+        self.request_errors: Dict[str, int] = {}
+        self.refreshes: Dict[str, Histogram] = {}
+        self.refresh_failures: Dict[str, int] = {}
+        self.event_latency = Histogram()
+        self.entities_notified = Histogram(COUNT_BUCKETS)
+        self.state_writes = 0
+        self.state_writes_skipped = 0
+        self.sse_events = 0
+        self.sse_event_rate = RateMeter()
+        # Eventi applicati e eventi superati da uno più recente della stessa zona/dispositivo
+        self.sse_dispatched = 0
+        self.sse_coalesced = 0
+        self.sse_parse_errors = 0
+        self.sse_reconnects = 0
+        # Connessioni chiuse dal watchdog per silenzio prolungato
+        self.sse_watchdog_trips = 0
+        self.sse_uptime = 0.0
+        self._sse_connected_at: Optional[float] = None
+
+    def observe_request(self, path: str, duration: float, success: bool = True) -> None:
+        label = endpoint_label(path)
+        self.requests.setdefault(label, Histogram()).observe(duration)
+        if not success:
+            self.request_errors[label] = self.request_errors.get(label, 0) + 1
+
+    def observe_refresh(self, name: str, duration: float, success: bool) -> None:
+        self.refreshes.setdefault(name, Histogram()).observe(duration)
+        if not success:
+            self.refresh_failures[name] = self.refresh_failures.get(name, 0) + 1
+
+    def observe_notified(self, count: int) -> None:
+        self.entities_notified.observe(count)
+
+    def sse_connected(self) -> None:
+        self._sse_connected_at = time.monotonic()
+
+    def sse_disconnected(self) -> None:
+        if self._sse_connected_at is not None:
+            self.sse_uptime += time.monotonic() - self._sse_connected_at
+            self._sse_connected_at = None
+        self.sse_reconnects += 1
+
+    def sse_event(self) -> None:
+        """Un evento decodificato dallo stream."""
+        self.sse_events += 1
+        self.sse_event_rate.mark()
+
+    def observe_dispatch(self, latency: float) -> None:
+        """Un evento applicato: `latency` va dalla ricezione alla scrittura degli stati."""
+        self.sse_dispatched += 1
+        self.event_latency.observe(latency)
+
+    @property
+    def sse_current_uptime(self) -> float:
+        """Durata (s) della connessione SSE attuale, 0 se disconnesso."""
+        if self._sse_connected_at is None:
+            return 0.0
+        return time.monotonic() - self._sse_connected_at
+
+    def request_latency_p95(self) -> Optional[float]:
+        """p95 (s) sulla richiesta più lenta tra gli endpoint osservati."""
+        values = [h.percentile(0.95) for h in self.requests.values() if h.count]
+        return max(values) if values else None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": {label: h.as_dict() for label, h in self.requests.items()},
+            "request_errors": dict(self.request_errors),
+            "refreshes": {name: h.as_dict() for name, h in self.refreshes.items()},
+            "refresh_failures": dict(self.refresh_failures),
+            "sse": {
+                "connected": self._sse_connected_at is not None,
+                "current_uptime": self.sse_current_uptime,
+                "total_uptime": self.sse_uptime + self.sse_current_uptime,
+                "reconnects": self.sse_reconnects,
+                "watchdog_trips": self.sse_watchdog_trips,
+                "events": self.sse_events,
+                "events_per_second": self.sse_event_rate.rate(),
+                "dispatched": self.sse_dispatched,
+                "coalesced": self.sse_coalesced,
+                "parse_errors": self.sse_parse_errors,
+            },
+            "event_to_state_latency": self.event_latency.as_dict(),
+            "entities_notified": self.entities_notified.as_dict(),
+            "state_writes": self.state_writes,
+            "state_writes_skipped": self.state_writes_skipped,
+        }
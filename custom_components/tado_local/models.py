@@ -0,0 +1,267 @@
+"""Record compatti di zone, dispositivi e acqua calda.
+
+I payload del bridge vengono normalizzati una sola volta, al refresh o all'evento:
+le entità leggono attributi tipizzati senza ripetere la lettura dei dict JSON.
+I record sono immutabili: un aggiornamento produce un nuovo record.
+"""
+from typing import Any, Dict, Iterable, Optional
+
+from .const import DOMAIN, MANUFACTURER, format_model
+
+
+def zone_id_of(zone: Dict[str, Any]) -> Any:
+    """Id di una zona (il bridge usa zone_id oppure id)."""
+    return zone.get("zone_id") or zone.get("id")
+
+
+def device_id_of(device: Dict[str, Any]) -> Any:
+    """Id di un dispositivo (il bridge usa device_id oppure id)."""
+    return device.get("device_id") or device.get("id")
+
+
+def _state_of(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Lo stato può essere annidato in "state" o stare al livello del record."""
+    state = payload.get("state", payload)
+    return state if isinstance(state, dict) else {}
+
+
+class ZoneState:
+    """Stato dinamico di una zona."""
+
+    __slots__ = ("cur_temp_c", "hum_perc", "target_temp_c", "cur_heating", "mode")
+
+    def __init__(
+        self,
+        cur_temp_c: Optional[float] = None,
+        hum_perc: Optional[float] = None,
+        target_temp_c: Optional[float] = None,
+        cur_heating: Any = 0,
+        mode: Any = None,
+    ) -> None:
+        self.cur_temp_c = cur_temp_c
+        self.hum_perc = hum_perc
+        self.target_temp_c = target_temp_c
+        self.cur_heating = cur_heating
+        self.mode = mode
+
+    @classmethod
+    def from_payload(cls, state: Dict[str, Any]) -> "ZoneState":
+        return cls(
+            state.get("cur_temp_c"),
+            state.get("hum_perc"),
+            state.get("target_temp_c"),
+            state.get("cur_heating", 0),
+            state.get("mode"),
+        )
+
+    def replace(self, **changes: Any) -> "ZoneState":
+        """Copia con alcuni valori sostituiti (es. stato ottimistico)."""
+        values = {name: getattr(self, name) for name in self.__slots__}
+        values.update(changes)
+        return ZoneState(**values)
+
+    def values(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+# Stato di una zona non (più) riportata dal bridge
+EMPTY_ZONE_STATE = ZoneState()
+
+
+class Zone:
+    """Zona del bridge, con device_info calcolato una volta."""
+
+    __slots__ = ("zone_id", "name", "zone_type", "state", "fingerprint", "device_info", "hot_water_device_info")
+
+    def __init__(
+        self,
+        zone_id: Any,
+        name: Optional[str],
+        zone_type: Optional[str],
+        state: ZoneState,
+        device_info: Optional[Dict[str, Any]] = None,
+        hot_water_device_info: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.zone_id = zone_id
+        self.name = name
+        self.zone_type = zone_type
+        self.state = state
+        # Valori confrontati per uguaglianza, non il loro hash (che può collidere)
+        self.fingerprint = (name, zone_type, state.values())
+        self.device_info = device_info or {
+            "identifiers": {(DOMAIN, "zone", zone_id)},
+            "name": name or f"Zona {zone_id}",
+            "manufacturer": MANUFACTURER,
+            "model": format_model("zone_control"),
+        }
+        if hot_water_device_info is None and zone_type == "HOT_WATER":
+            hot_water_device_info = {
+                "identifiers": {(DOMAIN, "hot_water", zone_id)},
+                "name": name or f"Hot Water {zone_id}",
+                "manufacturer": MANUFACTURER,
+                "model": format_model("hot_water"),
+            }
+        self.hot_water_device_info = hot_water_device_info
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> Optional["Zone"]:
+        zone_id = zone_id_of(payload)
+        if zone_id is None:
+            return None
+        return cls(
+            zone_id, payload.get("name"), payload.get("zone_type"), ZoneState.from_payload(_state_of(payload))
+        )
+
+    @property
+    def is_hot_water(self) -> bool:
+        return self.zone_type == "HOT_WATER"
+
+    def with_state(self, state: Dict[str, Any]) -> "Zone":
+        """Nuovo record con lo stato di un evento SSE (device_info condiviso)."""
+        return Zone(
+            self.zone_id,
+            self.name,
+            self.zone_type,
+            ZoneState.from_payload(state),
+            self.device_info,
+            self.hot_water_device_info,
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Formato del bridge (snapshot e diagnostica)."""
+        return {
+            "zone_id": self.zone_id,
+            "name": self.name,
+            "zone_type": self.zone_type,
+            "state": self.state.as_dict(),
+        }
+
+
+class Device:
+    """Dispositivo fisico (valvola, termostato, bridge)."""
+
+    __slots__ = ("device_id", "serial_number", "device_type", "zone_id", "battery_low", "fingerprint", "device_info")
+
+    def __init__(
+        self,
+        device_id: Any,
+        serial_number: Optional[str],
+        device_type: Optional[str],
+        zone_id: Any,
+        battery_low: bool,
+        device_info: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.device_id = device_id
+        self.serial_number = serial_number
+        self.device_type = device_type
+        self.zone_id = zone_id
+        self.battery_low = battery_low
+        self.fingerprint = (serial_number, device_type, zone_id, battery_low)
+        self.device_info = device_info or {
+            "identifiers": {(DOMAIN, "device", device_id)},
+            "name": f"Tado {serial_number or f'Unknown_{device_id}'}",
+            "manufacturer": MANUFACTURER,
+            "model": format_model(device_type or "Device"),
+            "via_device": (DOMAIN, "zone", zone_id) if zone_id else None,
+            "serial_number": serial_number or f"Unknown_{device_id}",
+        }
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> Optional["Device"]:
+        device_id = device_id_of(payload)
+        if device_id is None:
+            return None
+        return cls(
+            device_id,
+            payload.get("serial_number"),
+            payload.get("device_type"),
+            payload.get("zone_id"),
+            bool(_state_of(payload).get("battery_low", False)),
+        )
+
+    def with_state(self, state: Dict[str, Any]) -> "Device":
+        """Nuovo record con lo stato di un evento SSE (device_info condiviso)."""
+        return Device(
+            self.device_id,
+            self.serial_number,
+            self.device_type,
+            self.zone_id,
+            bool(state.get("battery_low", False)),
+            self.device_info,
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "device_id": self.device_id,
+            "serial_number": self.serial_number,
+            "device_type": self.device_type,
+            "zone_id": self.zone_id,
+            "state": {"battery_low": self.battery_low},
+        }
+
+
+class HotWater:
+    """Dettaglio di una zona acqua calda (/hot_water/{id}): stato e capacità."""
+
+    __slots__ = ("zone_id", "mode", "target_temp_c", "min_temp_c", "max_temp_c", "supports_temperature", "fingerprint")
+
+    def __init__(
+        self,
+        zone_id: Any,
+        mode: Any = None,
+        target_temp_c: Optional[float] = None,
+        min_temp_c: Optional[float] = None,
+        max_temp_c: Optional[float] = None,
+        supports_temperature: Optional[bool] = None,
+    ) -> None:
+        self.zone_id = zone_id
+        self.mode = mode
+        self.target_temp_c = target_temp_c
+        self.min_temp_c = min_temp_c
+        self.max_temp_c = max_temp_c
+        self.supports_temperature = supports_temperature
+        self.fingerprint = (mode, target_temp_c, min_temp_c, max_temp_c, supports_temperature)
+
+    @classmethod
+    def from_payload(cls, zone_id: Any, payload: Dict[str, Any]) -> "HotWater":
+        state = payload.get("state") or {}
+        return cls(
+            zone_id,
+            state.get("mode"),
+            state.get("target_temp_c"),
+            state.get("min_temp_c"),
+            state.get("max_temp_c"),
+            state.get("supports_temperature"),
+        )
+
+    def replace(self, **changes: Any) -> "HotWater":
+        """Copia con alcuni valori sostituiti (es. stato ottimistico)."""
+        values = self.as_dict()["state"]
+        values.update(changes)
+        return HotWater(self.zone_id, **values)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "state": {
+                "mode": self.mode,
+                "target_temp_c": self.target_temp_c,
+                "min_temp_c": self.min_temp_c,
+                "max_temp_c": self.max_temp_c,
+                "supports_temperature": self.supports_temperature,
+            }
+        }
+
+
+def parse_zones(payloads: Iterable[Dict[str, Any]]) -> Dict[Any, Zone]:
+    """Indice per id delle zone di una risposta /zones."""
+    zones = (Zone.from_payload(payload) for payload in payloads)
+    return {zone.zone_id: zone for zone in zones if zone is not None}
+
+
+def parse_devices(payloads: Iterable[Dict[str, Any]]) -> Dict[Any, Device]:
+    """Indice per id dei dispositivi di una risposta /devices."""
+    devices = (Device.from_payload(payload) for payload in payloads)
+    return {device.device_id: device for device in devices if device is not None}
@@ -1,67 +1,122 @@
 import logging
+import time
 from homeassistant.core import HomeAssistant
 from homeassistant.components.sensor import (
     SensorEntity,
     SensorDeviceClass,
     SensorStateClass,
 )
-from homeassistant.const import PERCENTAGE, UnitOfTemperature, EntityCategory
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
+from homeassistant.const import PERCENTAGE, UnitOfTemperature, UnitOfTime, EntityCategory
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .const import DOMAIN, MANUFACTURER, format_model
+from .entity import TadoLocalDeviceEntity, TadoLocalZoneEntity, async_setup_record_entities
+from .const import DOMAIN, MANUFACTURER
+from .history import TadoLocalZoneHistory
+from .metrics import TadoLocalMetrics
+from .models import EMPTY_ZONE_STATE, ZoneState
 
 _LOGGER = logging.getLogger(__name__)
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback) -> None:
     """Configura i sensori Tado Local."""
     data = hass.data[DOMAIN][entry.entry_id]
-    coordinator = data["coordinator"]
+    zone_coordinator = data["zone_coordinator"]
+    device_coordinator = data["device_coordinator"]
+    zone_history = data["zone_history"]
     
-    entities = []
-    
-    # 1. Sensori Zona (Umidità, Temp Corrente, Temp Target)
-    zones_data = coordinator.data.get("zones", [])
-    for zone in zones_data:
-        entities.append(TadoZoneHumidity(coordinator, zone))
-        entities.append(TadoZoneCurrentTemp(coordinator, zone))
-        entities.append(TadoZoneTargetTemp(coordinator, zone))
+    # 1. Sensori Zona (Umidità, Temp, Target e statistiche di riscaldamento), seguiti se cambiano le zone
+    async_setup_record_entities(
+        hass, entry, zone_coordinator, async_add_entities, "sensor", "zone",
+        lambda zone: [
+            TadoZoneHumidity(zone_coordinator, zone),
+            TadoZoneCurrentTemp(zone_coordinator, zone),
+            TadoZoneTargetTemp(zone_coordinator, zone),
+            *(
+                TadoZoneAnalytics(zone_coordinator, zone, zone_history, *description)
+                for description in ZONE_ANALYTICS
+            ),
+        ],
+    )
 
     # 2. Sensori Dispositivo (Numero di Serie)
-    devices_data = coordinator.data.get("devices", [])
-    for device in devices_data:
-        entities.append(TadoDeviceSerial(coordinator, device))
+    async_setup_record_entities(
+        hass, entry, device_coordinator, async_add_entities, "sensor", "device",
+        lambda device: [TadoDeviceSerial(device_coordinator, device)],
+    )
+
+    # 3. Metriche di prestazione del bridge (diagnostica, disabilitate di default)
+    metrics = data["client"].metrics
+    async_add_entities(
+        TadoBridgeMetric(entry, metrics, *description) for description in BRIDGE_METRICS
+    )
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+def _zone_refresh_ms(metrics: TadoLocalMetrics):
+    histogram = metrics.refreshes.get("tado_local_zones")
+    return _ms(histogram.last) if histogram else None
+
+
+# (chiave di traduzione, unità, state class, funzione che legge il valore dalle metriche)
+BRIDGE_METRICS = (
+    (
+        "sse_events_per_second", "events/s", SensorStateClass.MEASUREMENT,
+        lambda m: round(m.sse_event_rate.rate(), 2),
+    ),
+    ("sse_reconnects", None, SensorStateClass.TOTAL_INCREASING, lambda m: m.sse_reconnects),
+    ("zone_refresh_duration", UnitOfTime.MILLISECONDS, SensorStateClass.MEASUREMENT, _zone_refresh_ms),
+    (
+        "request_latency_p95", UnitOfTime.MILLISECONDS, SensorStateClass.MEASUREMENT,
+        lambda m: _ms(m.request_latency_p95()),
+    ),
+    (
+        "event_latency_p95", UnitOfTime.MILLISECONDS, SensorStateClass.MEASUREMENT,
+        lambda m: _ms(m.event_latency.percentile(0.95)),
+    ),
+)
+
 
-    async_add_entities(entities)
+def _rounded(value, digits):
+    return round(value, digits) if value is not None else None
+
+
+def _minutes(seconds):
+    return round(seconds / 60) if seconds is not None else None
+
+
+# (chiave di traduzione, unità, device class, state class, funzione che legge lo storico della zona)
+ZONE_ANALYTICS = (
+    (
+        "heating_duty_cycle", PERCENTAGE, None, SensorStateClass.MEASUREMENT,
+        lambda history, now: _rounded(history.duty_cycle(now), 1),
+    ),
+    (
+        "heating_time_today", UnitOfTime.HOURS, SensorDeviceClass.DURATION, SensorStateClass.TOTAL_INCREASING,
+        lambda history, now: round(history.heating_today(now) / 3600, 2),
+    ),
+    (
+        "temperature_trend", "°C/h", None, SensorStateClass.MEASUREMENT,
+        lambda history, now: _rounded(history.trend(now), 2),
+    ),
+    (
+        "time_since_heating", UnitOfTime.MINUTES, SensorDeviceClass.DURATION, None,
+        lambda history, now: _minutes(history.time_since_heating(now)),
+    ),
+)
 
 
-class TadoZoneBaseSensor(CoordinatorEntity, SensorEntity):
+class TadoZoneBaseSensor(TadoLocalZoneEntity, SensorEntity):
     """Classe base per sensori di zona."""
     
     _attr_has_entity_name = True
 
-    def __init__(self, coordinator, zone_data):
-        super().__init__(coordinator)
-        self._zone_id = zone_data.get("zone_id") or zone_data.get("id")
-        self._zone_name = zone_data.get("name")
-    
-    @property
-    def device_info(self):
-        return {
-            "identifiers": {(DOMAIN, "zone", self._zone_id)},
-            "name": self._zone_name,
-            "manufacturer": MANUFACTURER,
-            "model": format_model("zone_control"),
-        }
-
-    def _get_zone_state(self):
-        zones = self.coordinator.data.get("zones", [])
-        for zone in zones:
-            zid = zone.get("zone_id") or zone.get("id")
-            if zid == self._zone_id:
-                return zone.get("state", zone)
-        return {}
+    def _get_zone_state(self) -> ZoneState:
+        zone = self.record
+        return zone.state if zone is not None else EMPTY_ZONE_STATE
 
 
 class TadoZoneHumidity(TadoZoneBaseSensor):
@@ -78,7 +133,7 @@ class TadoZoneHumidity(TadoZoneBaseSensor):
 
     @property
     def native_value(self):
-        return self._get_zone_state().get("hum_perc")
+        return self._get_zone_state().hum_perc
 
 
 class TadoZoneCurrentTemp(TadoZoneBaseSensor):
@@ -95,7 +150,7 @@ class TadoZoneCurrentTemp(TadoZoneBaseSensor):
 
     @property
     def native_value(self):
-        return self._get_zone_state().get("cur_temp_c")
+        return self._get_zone_state().cur_temp_c
 
 
 class TadoZoneTargetTemp(TadoZoneBaseSensor):
@@ -112,10 +167,49 @@ class TadoZoneTargetTemp(TadoZoneBaseSensor):
 
     @property
     def native_value(self):
-        return self._get_zone_state().get("target_temp_c")
+        return self._get_zone_state().target_temp_c
+
+
+class TadoZoneAnalytics(TadoZoneBaseSensor):
+    """Statistica di riscaldamento calcolata dallo storico in memoria della zona."""
+
+    def __init__(
+        self,
+        coordinator,
+        zone,
+        zone_history: TadoLocalZoneHistory,
+        key,
+        unit,
+        device_class,
+        state_class,
+        value_fn,
+    ):
+        super().__init__(coordinator, zone)
+        self._zone_history = zone_history
+        self._value_fn = value_fn
+        self._attr_translation_key = key
+        self._attr_native_unit_of_measurement = unit
+        self._attr_device_class = device_class
+        self._attr_state_class = state_class
+        self._attr_unique_id = f"tado_local_{key}_{self._zone_id}"
+
+    def _fingerprint(self):
+        # Il valore dipende anche dal tempo: si scrive solo quando cambia quello mostrato
+        return self.native_value
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self.async_on_remove(self._zone_history.async_add_listener(self._handle_coordinator_update))
 
+    @property
+    def native_value(self):
+        history = self._zone_history.get(self._zone_id)
+        if history is None:
+            return None
+        return self._value_fn(history, time.time())
 
-class TadoDeviceSerial(CoordinatorEntity, SensorEntity):
+
+class TadoDeviceSerial(TadoLocalDeviceEntity, SensorEntity):
     """Sensore seriale dispositivo."""
     
     _attr_has_entity_name = True
@@ -123,40 +217,39 @@ class TadoDeviceSerial(CoordinatorEntity, SensorEntity):
     _attr_entity_category = EntityCategory.DIAGNOSTIC
     _attr_icon = "mdi:barcode" 
 
-    def __init__(self, coordinator, device_data):
-        super().__init__(coordinator)
-        self._device_id = device_data.get("device_id") or device_data.get("id")
-        self._serial = device_data.get("serial_number")
-        if not self._serial:
-            self._serial = f"Unknown_{self._device_id}"
-            
+    def __init__(self, coordinator, device):
+        super().__init__(coordinator, device)
         self._attr_unique_id = f"tado_local_serial_{self._device_id}"
-        
-        via_device = None
-        zone_id = device_data.get("zone_id")
-        if zone_id:
-            via_device = (DOMAIN, "zone", zone_id)
-            
-        raw_model = device_data.get("device_type", "Device")
-        
-        self._device_info_data = {
-            "identifiers": {(DOMAIN, "device", self._device_id)},
-            "name": f"Tado {self._serial}",
-            "manufacturer": MANUFACTURER,
-            "model": format_model(raw_model),
-            "via_device": via_device,
-            "serial_number": self._serial
-        }
 
     @property
-    def device_info(self):
-        return self._device_info_data
+    def native_value(self):
+        device = self.record
+        serial = device.serial_number if device is not None else None
+        return serial or f"Unknown_{self._device_id}"
+
+
+class TadoBridgeMetric(SensorEntity):
+    """Metrica di prestazione dell'integrazione, letta periodicamente dalla memoria."""
+
+    _attr_has_entity_name = True
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+    _attr_icon = "mdi:speedometer"
+    _attr_should_poll = True
+
+    def __init__(self, entry, metrics, key, unit, state_class, value_fn):
+        self._metrics = metrics
+        self._value_fn = value_fn
+        self._attr_translation_key = key
+        self._attr_native_unit_of_measurement = unit
+        self._attr_state_class = state_class
+        self._attr_unique_id = f"tado_local_{entry.entry_id}_{key}"
+        self._attr_device_info = {
+            "identifiers": {(DOMAIN, "bridge", entry.entry_id)},
+            "name": "Tado Local Bridge",
+            "manufacturer": MANUFACTURER,
+        }
 
     @property
     def native_value(self):
-        devices = self.coordinator.data.get("devices", [])
-        for dev in devices:
-            did = dev.get("device_id") or dev.get("id")
-            if did == self._device_id:
-                return dev.get("serial_number", self._serial)
-        return self._serial
\ No newline at end of file
+        return self._value_fn(self._metrics)
@@ -0,0 +1,136 @@
+"""Servizi dell'integrazione Tado Local."""
+import asyncio
+import logging
+from functools import partial
+from typing import Any, Dict, List
+
+import voluptuous as vol
+
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse
+from homeassistant.exceptions import ServiceValidationError
+import homeassistant.helpers.config_validation as cv
+
+from .commands import command_priority
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_SET_ZONES = "set_zones"
+
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+ATTR_ZONES = "zones"
+ATTR_ZONE_ID = "zone_id"
+ATTR_TEMPERATURE = "temperature"
+ATTR_MODE = "mode"
+
+ZONE_TARGET_SCHEMA = vol.All(
+    vol.Schema(
+        {
+            vol.Required(ATTR_ZONE_ID): vol.Any(cv.positive_int, cv.string),
+            # 0 = OFF, -1 = AUTO, altrimenti temperatura manuale
+            vol.Optional(ATTR_TEMPERATURE): vol.Coerce(float),
+            # Solo zone acqua calda: heat / auto / off
+            vol.Optional(ATTR_MODE): vol.In(["heat", "auto", "off"]),
+        }
+    ),
+    cv.has_at_least_one_key(ATTR_TEMPERATURE, ATTR_MODE),
+)
+
+SET_ZONES_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Required(ATTR_ZONES): vol.All(cv.ensure_list, [ZONE_TARGET_SCHEMA]),
+    }
+)
+
+
+def _resolve_entry_data(hass: HomeAssistant, entry_id: str | None) -> Dict[str, Any]:
+    entries = hass.data.get(DOMAIN, {})
+    if entry_id is not None:
+        if entry_id not in entries:
+            raise ServiceValidationError(f"Config entry Tado Local non caricata: {entry_id}")
+        return entries[entry_id]
+    if len(entries) != 1:
+        raise ServiceValidationError(
+            "Indicare config_entry_id: nessuna o più istanze Tado Local caricate"
+        )
+    return next(iter(entries.values()))
+
+
+def _match_zone_id(zones: Dict[Any, Any], zone_id: Any) -> Any:
+    """Accetta l'id come numero o stringa, qualunque sia il tipo usato dal bridge."""
+    candidates = [zone_id, str(zone_id)]
+    if str(zone_id).isdigit():
+        candidates.append(int(zone_id))
+    for candidate in candidates:
+        if candidate in zones:
+            return candidate
+    return zone_id
+
+
+async def _async_set_zones(hass: HomeAssistant, call: ServiceCall) -> ServiceResponse:
+    """Imposta più zone in parallelo e riallinea i dati una sola volta alla fine.
+
+    I comandi passano dallo scheduler dell'entry: concorrenza limitata, ritentativi e circuito.
+    """
+    data = _resolve_entry_data(hass, call.data.get(ATTR_CONFIG_ENTRY_ID))
+    coordinator = data["zone_coordinator"]
+    hot_water_coordinator = data["hot_water_coordinator"]
+    client = data["client"]
+    commands = data["commands"]
+    priority = command_priority(call.context)
+    zones = coordinator.data
+
+    async def apply(target: Dict[str, Any]) -> Dict[str, Any]:
+        zone_id = _match_zone_id(zones, target[ATTR_ZONE_ID])
+        result: Dict[str, Any] = {ATTR_ZONE_ID: zone_id, "success": False}
+        zone = zones.get(zone_id)
+        if zone is None:
+            result["error"] = "unknown zone"
+            return result
+
+        temperature = target.get(ATTR_TEMPERATURE)
+        try:
+            if zone.is_hot_water:
+                mode = target.get(ATTR_MODE) or "heat"
+                await commands.async_run(
+                    partial(client.async_set_hot_water, zone_id, mode, temperature), priority
+                )
+            elif temperature is None:
+                result["error"] = "temperature required for heating zones"
+                return result
+            else:
+                await commands.async_run(partial(client.async_set_zone, zone_id, temperature), priority)
+        except Exception as err:
+            _LOGGER.error("Errore impostazione zona %s: %s", zone_id, err)
+            result["error"] = str(err)
+            return result
+
+        result["success"] = True
+        return result
+
+    results: List[Dict[str, Any]] = await asyncio.gather(*(apply(t) for t in call.data[ATTR_ZONES]))
+
+    if any(r["success"] for r in results):
+        await coordinator.async_request_refresh()
+        if any(r["success"] and r[ATTR_ZONE_ID] in hot_water_coordinator.data for r in results):
+            await hot_water_coordinator.async_request_refresh()
+
+    return {"results": results}
+
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Registra i servizi dell'integrazione."""
+    if hass.services.has_service(DOMAIN, SERVICE_SET_ZONES):
+        return
+
+    async def handle_set_zones(call: ServiceCall) -> ServiceResponse:
+        return await _async_set_zones(hass, call)
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SET_ZONES,
+        handle_set_zones,
+        schema=SET_ZONES_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
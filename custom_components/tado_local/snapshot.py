@@ -0,0 +1,94 @@
+"""Snapshot persistente di topologia e stato, per l'avvio senza attendere il bridge."""
+import logging
+from typing import Any, Callable, Dict
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+from .coordinator import TadoLocalDeviceCoordinator, TadoLocalHotWaterCoordinator, TadoLocalZoneCoordinator
+from .history import TadoLocalZoneHistory
+from .models import HotWater, parse_devices, parse_zones
+
+_LOGGER = logging.getLogger(__name__)
+
+STORAGE_VERSION = 1
+# Ritardo (s) del salvataggio: più modifiche ravvicinate producono una sola scrittura
+SAVE_DELAY = 60
+
+
+class TadoLocalSnapshot:
+    """Salva zone, dispositivi, acqua calda e contatori dello storico e li ripristina all'avvio successivo."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry_id: str,
+        zone_coordinator: TadoLocalZoneCoordinator,
+        device_coordinator: TadoLocalDeviceCoordinator,
+        hot_water_coordinator: TadoLocalHotWaterCoordinator,
+        zone_history: TadoLocalZoneHistory,
+    ) -> None:
+        self._store: Store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}")
+        self.zone_coordinator = zone_coordinator
+        self.device_coordinator = device_coordinator
+        self.hot_water_coordinator = hot_water_coordinator
+        self.zone_history = zone_history
+
+    async def async_restore(self) -> bool:
+        """Carica lo snapshot nei coordinator; False se non c'è (primo avvio)."""
+        try:
+            data = await self._store.async_load()
+        except Exception as err:
+            _LOGGER.warning("Snapshot Tado Local illeggibile, ignorato: %s", err)
+            return False
+        if not data or not data.get("zones"):
+            return False
+
+        self.zone_coordinator.async_restore(parse_zones(data["zones"]))
+        self.device_coordinator.async_restore(parse_devices(data.get("devices", [])))
+        # Le chiavi JSON sono stringhe: l'acqua calda è salvata come coppie [id, record]
+        self.hot_water_coordinator.async_restore(
+            {zid: HotWater.from_payload(zid, record) for zid, record in data.get("hot_water", [])}
+        )
+        # Ore di riscaldamento di oggi e ultimo riscaldamento: i campioni non vengono salvati
+        self.zone_history.restore(data.get("zone_history", []))
+        _LOGGER.debug("Tado Local avviato dallo snapshot: %d zone", len(data["zones"]))
+        return True
+
+    @callback
+    def async_track(self) -> Callable[[], None]:
+        """Programma un salvataggio a ogni cambiamento; restituisce la funzione di disiscrizione."""
+        unsubs = []
+        for coordinator in (self.zone_coordinator, self.device_coordinator, self.hot_water_coordinator):
+            unsubs.append(coordinator.async_add_listener(self.async_schedule_save))
+            unsubs.append(coordinator.async_add_record_listener(self.async_schedule_save))
+
+        @callback
+        def unsubscribe() -> None:
+            for unsub in unsubs:
+                unsub()
+
+        return unsubscribe
+
+    @callback
+    def async_schedule_save(self) -> None:
+        if self.zone_coordinator.data is None:
+            return
+        self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    @callback
+    def _data_to_save(self) -> Dict[str, Any]:
+        return {
+            "zones": [zone.as_dict() for zone in self.zone_coordinator.data.values()],
+            "devices": [device.as_dict() for device in (self.device_coordinator.data or {}).values()],
+            "hot_water": [
+                [zid, record.as_dict()] for zid, record in (self.hot_water_coordinator.data or {}).items()
+            ],
+            "zone_history": self.zone_history.as_saved(),
+        }
+
+
+async def async_remove_snapshot(hass: HomeAssistant, entry_id: str) -> None:
+    """Elimina lo snapshot di una config entry rimossa."""
+    await Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}").async_remove()
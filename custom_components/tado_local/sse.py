@@ -0,0 +1,347 @@
+"""Listener dello stream SSE /events di TadoLocal."""
+import asyncio
+import logging
+import random
+import socket
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from homeassistant.core import HomeAssistant, callback
+
+from .api import TadoLocalClient
+from .const import DEFAULT_SSE_MAX_SILENCE
+from .coordinator import TadoLocalDeviceCoordinator, TadoLocalZoneCoordinator
+from .sse_parser import JSONDecodeError, SSEEvent, SSEParser
+
+_LOGGER = logging.getLogger(__name__)
+
+# Stati della connessione SSE
+SSE_DISCONNECTED = "disconnected"
+SSE_CONNECTING = "connecting"
+SSE_CONNECTED = "connected"
+
+# Backoff esponenziale (secondi) tra i tentativi di riconnessione
+BACKOFF_MIN = 1
+BACKOFF_MAX = 120
+# Una connessione rimasta aperta almeno questi secondi azzera il backoff anche senza dati
+STABLE_CONNECTION_TIME = 30
+# Attesa (s) prima di passare a un altro endpoint sano quando lo stream cade
+FAILOVER_DELAY = 0.1
+# Finestra (s) in cui gli eventi si accumulano prima di essere applicati in blocco
+DISPATCH_WINDOW = 0.05
+# Chiavi in attesa oltre le quali il blocco si applica subito (coda limitata)
+MAX_PENDING = 1000
+# Keepalive TCP sullo stream (s): un host sparito senza FIN viene rilevato anche dal kernel
+TCP_KEEPALIVE_IDLE = 30
+TCP_KEEPALIVE_INTERVAL = 10
+TCP_KEEPALIVE_COUNT = 3
+
+
+def event_key(event: Dict[str, Any]) -> Any:
+    """Chiave di coalescenza: un evento più recente per la stessa chiave sostituisce il precedente."""
+    event_type = event.get("type")
+    if event_type == "zone" and event.get("zone_id") is not None:
+        return ("zone", event["zone_id"])
+    if event_type == "device" and event.get("device_id") is not None:
+        return ("device", event["device_id"])
+    # Eventi senza id: mai accorpati
+    return object()
+
+
+def backoff_delay(attempt: int, minimum: float = BACKOFF_MIN) -> float:
+    """Attesa prima del tentativo `attempt` (0-based), con jitter.
+
+    `minimum` è il ritardo base, eventualmente imposto dal bridge col campo retry.
+    """
+    delay = min(BACKOFF_MAX, minimum * 2 ** attempt)
+    # "Equal jitter": evita che più istanze si riconnettano in sincrono
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def _enable_tcp_keepalive(response: Any) -> None:
+    """Attiva il keepalive TCP sul socket dello stream, dove il sistema lo supporta."""
+    connection = response.connection
+    transport = connection.transport if connection is not None else None
+    sock = transport.get_extra_info("socket") if transport is not None else None
+    if sock is None:
+        return
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        for option, value in (
+            ("TCP_KEEPIDLE", TCP_KEEPALIVE_IDLE),
+            ("TCP_KEEPINTVL", TCP_KEEPALIVE_INTERVAL),
+            ("TCP_KEEPCNT", TCP_KEEPALIVE_COUNT),
+        ):
+            if hasattr(socket, option):
+                sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+    except OSError as err:
+        _LOGGER.debug("Keepalive TCP non disponibile sullo stream SSE: %s", err)
+
+
+class TadoLocalEventStream:
+    """Mantiene lo stream SSE e ne comunica lo stato di salute al coordinator delle zone.
+
+    C'è un solo stream per config entry, condiviso dai coordinator di zone e
+    dispositivi. Se l'endpoint in uso cade e un altro è sano, lo stream vi si
+    sposta senza attendere il backoff.
+
+    La lettura del socket si limita a decodificare e accodare: gli eventi vengono
+    applicati in blocchi ogni `DISPATCH_WINDOW`, con al più un aggiornamento per
+    zona o dispositivo (l'evento più recente sostituisce quelli in attesa).
+
+    Un watchdog chiude lo stream se per `max_silence` secondi non arriva nulla,
+    né eventi né commenti heartbeat (0 = disattivato): una connessione rimasta
+    aperta a metà non blocca più gli aggiornamenti push senza che nessuno se ne accorga.
+    Si arma solo dopo il primo heartbeat della connessione: un bridge che non ne
+    invia può restare in silenzio quanto vuole.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        zone_coordinator: TadoLocalZoneCoordinator,
+        device_coordinator: TadoLocalDeviceCoordinator,
+        client: TadoLocalClient,
+        max_silence: float = DEFAULT_SSE_MAX_SILENCE,
+    ) -> None:
+        self.hass = hass
+        self.zone_coordinator = zone_coordinator
+        self.device_coordinator = device_coordinator
+        self.client = client
+        self.state = SSE_DISCONNECTED
+        self.resync_count = 0
+        self.parser = SSEParser()
+        # Ultimo id SSE ricevuto, inviato come Last-Event-ID alla riconnessione
+        self.last_event_id: Optional[str] = None
+        self._check_next_id = False
+        self._response: Optional[Any] = None
+        # Endpoint dello stream attuale: gli id SSE non valgono tra processi diversi
+        self.stream_url: Optional[str] = None
+        # Eventi in attesa di applicazione, per chiave, con l'istante di ricezione
+        self._pending: Dict[Any, Tuple[Dict[str, Any], float]] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self.max_silence = max_silence
+        # Ultima ricezione dal socket (eventi o commenti), controllata dal watchdog
+        self._last_activity = 0.0
+        self._watchdog: Optional[asyncio.TimerHandle] = None
+        # Heartbeat visto sulla connessione attuale / connessione chiusa dal watchdog
+        self._heartbeat_seen = False
+        self._silenced = False
+
+    def _set_state(self, state: str, refresh: bool = True) -> None:
+        if state == self.state:
+            return
+        _LOGGER.debug("Stream SSE Tado Local: %s -> %s", self.state, state)
+        if state == SSE_CONNECTED:
+            self.client.metrics.sse_connected()
+        elif self.state == SSE_CONNECTED:
+            self.client.metrics.sse_disconnected()
+        self.state = state
+        self.zone_coordinator.async_set_push_connected(state == SSE_CONNECTED, refresh)
+
+    async def run(self) -> None:
+        """Ciclo di vita dello stream: connessione, lettura, riconnessione."""
+        attempt = 0
+        connected_once = False
+        while True:
+            self._set_state(SSE_CONNECTING)
+            url = self.client.base_url
+            if url != self.stream_url:
+                if self.stream_url is not None:
+                    _LOGGER.debug("Stream SSE Tado Local spostato su %s", url)
+                    self._drop_event_id()
+                self.stream_url = url
+            opened: Optional[float] = None
+            try:
+                async with self.client.events(self.last_event_id, url) as response:
+                    self._response = response
+                    if response.status != 200:
+                        raise ConnectionError(f"Errore API /events: {response.status}")
+                    _enable_tcp_keepalive(response)
+                    self._set_state(SSE_CONNECTED)
+                    opened = time.monotonic()
+                    self.parser.reset()
+                    if connected_once:
+                        self._on_reconnected()
+                    connected_once = True
+                    self._silenced = False
+                    self._heartbeat_seen = False
+                    heartbeats = self.parser.comments
+                    async for chunk in response.content.iter_any():
+                        received = time.monotonic()
+                        self._last_activity = received
+                        events = self.parser.feed(chunk)
+                        for event in events:
+                            self._handle_event(event, received)
+                        if attempt and (events or self.parser.comments != heartbeats):
+                            # Stream che consegna dati: il backoff riparte dal minimo.
+                            # Un bridge che accetta e chiude subito resta invece in backoff
+                            attempt = 0
+                        if not self._heartbeat_seen and self.parser.comments != heartbeats:
+                            self._heartbeat_seen = True
+                            self._start_watchdog()
+            except asyncio.CancelledError:
+                # Scaricamento dell'entry: nessun riallineamento da richiedere
+                self.state = SSE_DISCONNECTED
+                if self._flush_handle is not None:
+                    self._flush_handle.cancel()
+                    self._flush_handle = None
+                raise
+            except Exception as err:
+                _LOGGER.debug("Stream SSE interrotto: %s", err)
+            finally:
+                self._response = None
+                self._stop_watchdog()
+            if opened is not None and time.monotonic() - opened >= STABLE_CONNECTION_TIME:
+                attempt = 0
+
+            # Dopo un intervento del watchdog il riallineamento è già partito e
+            # l'endpoint non è guasto: ha solo smesso di parlare su questa connessione
+            self._set_state(SSE_DISCONNECTED, refresh=not self._silenced)
+            if url == self.stream_url and not self._silenced:
+                self.client.mark_failed(url)
+            failover = self.client.base_url
+            if failover != url and self.client.is_healthy(failover):
+                # Un altro endpoint è sano: ci si sposta subito
+                await asyncio.sleep(FAILOVER_DELAY)
+                continue
+            retry = self.parser.retry
+            await asyncio.sleep(backoff_delay(attempt, retry / 1000 if retry else BACKOFF_MIN))
+            attempt += 1
+
+    def reconnect(self) -> None:
+        """Chiude la connessione attuale: il ciclo si ricollega (es. nuovo indirizzo del bridge).
+
+        Senza Last-Event-ID la riconnessione comporta un riallineamento completo.
+        """
+        self._drop_event_id()
+        self.stream_url = None
+        if self._response is not None:
+            self._response.close()
+
+    def _drop_event_id(self) -> None:
+        """Dimentica l'ultimo id SSE, anche quello che il parser assegna agli eventi senza id."""
+        self.last_event_id = None
+        self.parser.last_event_id = None
+
+    @callback
+    def set_max_silence(self, max_silence: float) -> None:
+        """Nuova soglia di silenzio, applicata anche alla connessione in corso."""
+        self.max_silence = max_silence
+        if self._response is not None and self._heartbeat_seen:
+            self._start_watchdog()
+
+    def _start_watchdog(self) -> None:
+        self._stop_watchdog()
+        if self.max_silence:
+            self._watchdog = self.hass.loop.call_later(self.max_silence, self._check_silence)
+
+    def _stop_watchdog(self) -> None:
+        if self._watchdog is not None:
+            self._watchdog.cancel()
+            self._watchdog = None
+
+    @callback
+    def _check_silence(self) -> None:
+        """Un solo timer per connessione: si riarma per il tempo mancante finché arrivano dati."""
+        self._watchdog = None
+        if self._response is None:
+            return
+        silence = time.monotonic() - self._last_activity
+        if silence < self.max_silence:
+            self._watchdog = self.hass.loop.call_later(self.max_silence - silence, self._check_silence)
+            return
+        _LOGGER.warning("Stream SSE Tado Local silenzioso da %.0fs: riconnessione", silence)
+        self.client.metrics.sse_watchdog_trips += 1
+        # Un solo riallineamento per intervento, delle sole zone: né la disconnessione
+        # né la riconnessione ne chiedono un altro
+        self._silenced = True
+        self.resync_count += 1
+        self.hass.async_create_task(self.zone_coordinator.async_request_resync())
+        self._response.close()
+
+    def _on_reconnected(self) -> None:
+        if self._silenced:
+            # Riallineamento già chiesto dal watchdog
+            return
+        if self.last_event_id is None:
+            # Il bridge non numera gli eventi: impossibile sapere cosa è andato perso
+            self._resync("riconnessione senza Last-Event-ID")
+        else:
+            # Il primo evento dirà se il bridge ha ritrasmesso dal punto giusto
+            self._check_next_id = True
+
+    def _resync(self, reason: str) -> None:
+        _LOGGER.debug("Riallineamento Tado Local dopo buco negli eventi SSE: %s", reason)
+        self.resync_count += 1
+        self.hass.async_create_task(self.zone_coordinator.async_request_resync())
+        self.hass.async_create_task(self.device_coordinator.async_request_resync())
+
+    def _check_sequence(self, event_id: str) -> None:
+        """Rileva eventi persi confrontando id numerici consecutivi."""
+        previous = self.last_event_id
+        self.last_event_id = event_id
+        check_next, self._check_next_id = self._check_next_id, False
+        if previous is None:
+            return
+        try:
+            expected = int(previous) + 1
+            received = int(event_id)
+        except ValueError:
+            # Id non numerici: la continuità è affidata al replay del bridge
+            return
+        if received != expected:
+            self._resync(f"atteso id {expected}, ricevuto {received}")
+        elif check_next:
+            _LOGGER.debug("Stream SSE ripreso senza perdite dall'id %s", event_id)
+
+    def _handle_event(self, event: SSEEvent, received: float) -> None:
+        """Verifica la sequenza e applica i dati di un evento completo."""
+        # Un evento senza campo id eredita l'ultimo: non è un nuovo numero di sequenza
+        if event.id and event.id != self.last_event_id:
+            self._check_sequence(event.id)
+        if not event.data:
+            return
+        try:
+            event_data = event.json()
+        except JSONDecodeError as err:
+            self.client.metrics.sse_parse_errors += 1
+            _LOGGER.debug("Evento SSE non valido (%s): %s", err, event.data[:200])
+            return
+        if not isinstance(event_data, dict):
+            return
+        if event.event != "message":
+            event_data.setdefault("type", event.event)
+        self.client.metrics.sse_event()
+        self._enqueue(event_data, received)
+
+    def _enqueue(self, event: Dict[str, Any], received: float) -> None:
+        key = event_key(event)
+        if key in self._pending:
+            self.client.metrics.sse_coalesced += 1
+        self._pending[key] = (event, received)
+        if len(self._pending) >= MAX_PENDING:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = self.hass.loop.call_later(DISPATCH_WINDOW, self._flush)
+
+    @callback
+    def _flush(self) -> None:
+        """Applica in blocco gli eventi in attesa."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, {}
+        metrics = self.client.metrics
+        for event, received in pending.values():
+            self._dispatch(event)
+            metrics.observe_dispatch(time.monotonic() - received)
+
+    def _dispatch(self, event: Dict[str, Any]) -> None:
+        """Instrada l'evento al coordinator competente."""
+        new_state = event.get("state")
+        event_type = event.get("type")
+        if new_state and event_type == "zone":
+            self.zone_coordinator.handle_event(event.get("zone_id"), new_state)
+        elif new_state and event_type == "device":
+            self.device_coordinator.handle_event(event.get("device_id"), new_state)
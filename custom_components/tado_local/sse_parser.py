@@ -0,0 +1,124 @@
+"""Parser incrementale per stream Server-Sent Events.
+
+Lavora su blocchi di byte grezzi (come arrivano dal socket) e restituisce
+eventi completi secondo la specifica WHATWG. Non dipende da Home Assistant,
+così può essere misurato anche da solo (vedi benchmarks/).
+"""
+import json
+from typing import Any, List, Optional
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dipende dall'ambiente
+    orjson = None
+
+_BOM = b"\xef\xbb\xbf"
+
+
+if orjson is not None:
+    json_loads = orjson.loads
+    JSONDecodeError = (orjson.JSONDecodeError, ValueError)
+else:
+    json_loads = json.loads
+    JSONDecodeError = (ValueError,)
+
+
+class SSEEvent:
+    """Evento SSE completo. `data` resta in byte: il decoder JSON li accetta così."""
+
+    __slots__ = ("event", "data", "id", "retry")
+
+    def __init__(self, event: str, data: bytes, id: Optional[str], retry: Optional[int]) -> None:
+        self.event = event
+        self.data = data
+        self.id = id
+        self.retry = retry
+
+    def json(self) -> Any:
+        """Decodifica il campo data come JSON (solleva JSONDecodeError)."""
+        return json_loads(self.data)
+
+    def __repr__(self) -> str:
+        return f"SSEEvent(event={self.event!r}, id={self.id!r}, data={self.data!r})"
+
+
+class SSEParser:
+    """Assembla eventi SSE da blocchi di byte arbitrari."""
+
+    def __init__(self) -> None:
+        self._buffer = b""
+        self._data: List[bytes] = []
+        self._event = ""
+        self._started = False
+        # Persistenti tra eventi, come richiesto dalla specifica
+        self.last_event_id: Optional[str] = None
+        self.retry: Optional[int] = None
+        # Righe di commento (": ...") viste, usate dal bridge come heartbeat
+        self.comments = 0
+
+    def reset(self) -> None:
+        """Scarta l'evento parziale (es. dopo una riconnessione)."""
+        self._buffer = b""
+        self._data = []
+        self._event = ""
+        self._started = False
+
+    def feed(self, chunk: bytes) -> List[SSEEvent]:
+        """Elabora un blocco di byte e restituisce gli eventi completati."""
+        data = self._buffer + chunk if self._buffer else chunk
+        if not self._started:
+            if len(data) < len(_BOM) and _BOM.startswith(data):
+                self._buffer = data
+                return []
+            if data.startswith(_BOM):
+                data = data[len(_BOM):]
+            self._started = True
+
+        if b"\r" in data:
+            # Un \r finale potrebbe essere la prima metà di \r\n: si attende il blocco successivo
+            if data.endswith(b"\r"):
+                self._buffer = data[-1:]
+                data = data[:-1]
+            else:
+                self._buffer = b""
+            data = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+            lines = data.split(b"\n")
+            self._buffer = lines.pop() + self._buffer
+        else:
+            lines = data.split(b"\n")
+            self._buffer = lines.pop()
+
+        events: List[SSEEvent] = []
+        for line in lines:
+            if not line:
+                if self._data:
+                    events.append(
+                        SSEEvent(self._event or "message", b"\n".join(self._data), self.last_event_id, self.retry)
+                    )
+                    self._data = []
+                self._event = ""
+                continue
+
+            colon = line.find(b":")
+            if colon == 0:
+                self.comments += 1
+                continue
+            if colon < 0:
+                field, value = line, b""
+            else:
+                field = line[:colon]
+                value = line[colon + 1:]
+                if value[:1] == b" ":
+                    value = value[1:]
+
+            if field == b"data":
+                self._data.append(value)
+            elif field == b"event":
+                self._event = value.decode("utf-8", "replace")
+            elif field == b"id":
+                if b"\x00" not in value:
+                    self.last_event_id = value.decode("utf-8", "replace")
+            elif field == b"retry":
+                if value.isdigit():
+                    self.retry = int(value)
+        return events
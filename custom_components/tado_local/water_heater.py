@@ -1,18 +1,21 @@
 import logging
+from functools import partial
 from typing import Any, Dict
 
-import aiohttp
 from homeassistant.components.water_heater import (
     WaterHeaterEntity,
     WaterHeaterEntityFeature,
 )
 from homeassistant.const import ATTR_TEMPERATURE, UnitOfTemperature, PRECISION_TENTHS
 from homeassistant.core import HomeAssistant
-from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.config_entries import ConfigEntry
 
-from .const import DOMAIN, MANUFACTURER, format_model
+from .api import TadoLocalApiError, TadoLocalClient
+from .entity import TadoLocalZoneEntity, async_setup_record_entities, values_match
+from .commands import CommandScheduler, command_priority
+from .const import DOMAIN
+from .models import HotWater, Zone
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -22,23 +25,39 @@ OPERATION_AUTO = "auto"
 OPERATION_LIST = [OPERATION_HEAT, OPERATION_AUTO, OPERATION_OFF]
 
 
+def operation_of(mode: Any) -> str:
+    """Map the bridge mode (number or string) to a water heater operation."""
+    if mode is None:
+        return OPERATION_AUTO
+    if mode == 0 or str(mode).lower() == "off":
+        return OPERATION_OFF
+    if str(mode).lower() in ("auto", "schedule", "smart_schedule"):
+        return OPERATION_AUTO
+    return OPERATION_HEAT
+
+
 async def async_setup_entry(
     hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
 ) -> None:
     """Set up hot water entities."""
     data = hass.data[DOMAIN][entry.entry_id]
-    coordinator = data["coordinator"]
-    base_url = data["base_url"]
-
-    entities = []
-    for zone in coordinator.data.get("zones", []):
-        if zone.get("zone_type") == "HOT_WATER":
-            entities.append(TadoLocalHotWater(coordinator, zone, base_url))
-
-    async_add_entities(entities)
+    zone_coordinator = data["zone_coordinator"]
+    coordinator = data["hot_water_coordinator"]
+    client = data["client"]
+    commands = data["commands"]
+
+    def create_entities(zone):
+        if not zone.is_hot_water:
+            return []
+        return [TadoLocalHotWater(coordinator, zone, client, commands)]
+
+    # Hot water zones are tracked on the zone list: added or removed ones follow live
+    async_setup_record_entities(
+        hass, entry, zone_coordinator, async_add_entities, "water_heater", "hot_water", create_entities
+    )
 
 
-class TadoLocalHotWater(CoordinatorEntity, WaterHeaterEntity):
+class TadoLocalHotWater(TadoLocalZoneEntity, WaterHeaterEntity):
     """Representation of a Tado Local hot water zone."""
 
     _attr_has_entity_name = True
@@ -50,44 +69,41 @@ class TadoLocalHotWater(CoordinatorEntity, WaterHeaterEntity):
 
     _attr_operation_list = OPERATION_LIST
 
-    def __init__(self, coordinator, initial_data: Dict[str, Any], base_url: str) -> None:
-        super().__init__(coordinator)
-        self._zone_id = initial_data.get("zone_id") or initial_data.get("id")
-        self._attr_name = initial_data.get("name", f"Hot Water {self._zone_id}")
+    def __init__(
+        self,
+        coordinator,
+        zone: Zone,
+        client: TadoLocalClient,
+        commands: CommandScheduler,
+    ) -> None:
+        super().__init__(coordinator, zone)
+        self._attr_name = zone.name or f"Hot Water {self._zone_id}"
         self._attr_unique_id = f"tado_local_hot_water_{self._zone_id}"
-        self._base_url = base_url
-
-    @property
-    def device_info(self):
-        return {
-            "identifiers": {(DOMAIN, "hot_water", self._zone_id)},
-            "name": self._attr_name,
-            "manufacturer": MANUFACTURER,
-            "model": format_model("hot_water"),
-        }
-
-    @property
-    def _zone_state(self) -> Dict[str, Any]:
-        for zone in self.coordinator.data.get("zones", []):
-            zid = zone.get("zone_id") or zone.get("id")
-            if zid == self._zone_id:
-                return zone.get("state", zone) or {}
-        return {}
+        self._attr_device_info = zone.hot_water_device_info
+        self._client = client
+        self._commands = commands
 
     @property
-    def _hw_state(self) -> Dict[str, Any]:
-        return self._zone_state.get("hot_water", {})
+    def _hw_state(self) -> HotWater:
+        hw_state = self.record or HotWater(self._zone_id)
+        if self._optimistic:
+            return hw_state.replace(**self._optimistic)
+        return hw_state
 
     @property
     def current_operation(self) -> str:
-        mode = self._hw_state.get("mode") or "auto"
-        if mode == 0:
-            return OPERATION_OFF
-        if str(mode).lower() == "off":
-            return OPERATION_OFF
-        if str(mode).lower() in ("auto", "schedule", "smart_schedule"):
-            return OPERATION_AUTO
-        return OPERATION_HEAT
+        return operation_of(self._hw_state.mode)
+
+    def _optimistic_confirmed(self) -> bool:
+        record = self.record
+        if record is None:
+            return False
+        requested = self._optimistic
+        # The bridge may report the mode as a number or under another name
+        if "mode" in requested and operation_of(record.mode) != operation_of(requested["mode"]):
+            return False
+        target = requested.get("target_temp_c")
+        return target is None or values_match(record.target_temp_c, target)
 
     @property
     def current_temperature(self):
@@ -96,18 +112,18 @@ class TadoLocalHotWater(CoordinatorEntity, WaterHeaterEntity):
 
     @property
     def target_temperature(self):
-        return self._hw_state.get("target_temp_c")
+        return self._hw_state.target_temp_c
 
     @property
     def min_temp(self):
-        min_t = self._hw_state.get("min_temp_c")
+        min_t = self._hw_state.min_temp_c
         if min_t is None:
             return 30
         return min_t
 
     @property
     def max_temp(self):
-        max_t = self._hw_state.get("max_temp_c")
+        max_t = self._hw_state.max_temp_c
         if max_t is None:
             return 80
         return max_t
@@ -115,7 +131,7 @@ class TadoLocalHotWater(CoordinatorEntity, WaterHeaterEntity):
     @property
     def supported_features(self):
         # Drop temperature feature if the zone does not support setting temp
-        supports_temp = self._hw_state.get("supports_temperature")
+        supports_temp = self._hw_state.supports_temperature
         if supports_temp is False:
             return WaterHeaterEntityFeature.OPERATION_MODE
         return self._attr_supported_features
@@ -136,17 +152,33 @@ class TadoLocalHotWater(CoordinatorEntity, WaterHeaterEntity):
         await self._send_hot_water_update(mode=OPERATION_OFF)
 
     async def _send_hot_water_update(self, mode: str, temperature: float | None = None):
-        params = {"mode": mode}
-        if temperature is not None and WaterHeaterEntityFeature.TARGET_TEMPERATURE in self.supported_features:
-            params["temperature"] = str(temperature)
-
-        url = f"{self._base_url}/hot_water/{self._zone_id}/set"
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.post(url, params=params) as response:
-                    if response.status != 200:
-                        _LOGGER.error("Hot water update error: %s", await response.text())
-                    else:
-                        await self.coordinator.async_request_refresh()
-            except Exception as err:
-                _LOGGER.error("Connection error updating hot water: %s", err)
+        if WaterHeaterEntityFeature.TARGET_TEMPERATURE not in self.supported_features:
+            temperature = None
+        # Fail the service call right away while the bridge is known to be failing
+        self._commands.raise_if_open()
+        priority = command_priority(self._context)
+
+        # Apply the requested values right away; only the latest one reaches the bridge
+        optimistic: Dict[str, Any] = {"mode": mode}
+        if temperature is not None:
+            optimistic["target_temp_c"] = float(temperature)
+        self._async_set_optimistic(optimistic)
+        self._commands.async_submit(
+            ("hot_water", self._zone_id), partial(self._async_write_hot_water, mode, temperature, priority)
+        )
+
+    async def _async_write_hot_water(self, mode: str, temperature: float | None, priority: int) -> None:
+        try:
+            await self._commands.async_run(
+                partial(self._client.async_set_hot_water, self._zone_id, mode, temperature), priority
+            )
+        except TadoLocalApiError as err:
+            _LOGGER.error("Hot water update error: %s", err)
+            self._async_rollback_optimistic()
+        except Exception as err:
+            _LOGGER.error("Connection error updating hot water: %s", err)
+            self._async_rollback_optimistic()
+        else:
+            self._async_optimistic_sent()
+            # Only confirms if the read already reports the sent values; otherwise the SSE event does
+            await self.coordinator.async_refresh_zone(self._zone_id)